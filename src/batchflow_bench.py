@@ -0,0 +1,256 @@
+# Headless benchmarks for BatchManager.
+#
+#   python batchflow_bench.py                          # 1k / 10k / 100k libraries
+#   python batchflow_bench.py --sizes 1000 --out bench.json
+#   python batchflow_bench.py --baseline bench.json    # compare, exit 1 on regression
+#
+# Every run works in a throwaway HOME, so the real batchflow-data is never touched.
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+os.environ.setdefault('KIVY_NO_FILELOG', '1')
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_BOARD = 2000
+DEFAULT_REPEAT = 30
+# A p50 more than this factor above the baseline counts as a regression
+DEFAULT_TOLERANCE = 1.25
+
+STYLES = ["1A - American Light Lager", "5B - Kölsch", "10A - Weissbier", "18B - American Pale Ale",
+          "21A - American IPA", "20C - Imperial Stout", "M1A - Dry Mead", "C1A - New World Cider"]
+WORDS = ["Hazy", "Golden", "Citra", "Old", "Dark", "Session", "Double", "Pilsner", "Porter",
+         "Wheat", "Farmhouse", "Amber", "Red", "Smoked", "Oak", "Coffee", "Summer", "Winter"]
+
+def make_library(prefix, count, rng):
+    bevs = []
+    for i in range(count):
+        bevs.append({
+            "id": f"{prefix}-{i:06d}",
+            "name": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}",
+            "bjcp": rng.choice(STYLES),
+            "abv": f"{rng.uniform(3, 12):.1f}",
+            "ibu": rng.randint(5, 100),
+            "srm": rng.randint(2, 40),
+            "description": "Synthetic benchmark beverage. " * 4
+        })
+    return {"beverages": bevs}
+
+def build_fixture(home, size, board, rng):
+    # local, lite and monitor each get `size` beverages; a slice of lite/monitor
+    # ids repeat local ones so the override path is exercised too
+    dirs = {
+        'local': os.path.join(home, "batchflow-data"),
+        'lite': os.path.join(home, "keglevel_lite-data"),
+        'monitor': os.path.join(home, "keglevel-data")
+    }
+    libs = {}
+    for tag, d in dirs.items():
+        os.makedirs(d, exist_ok=True)
+        libs[tag] = make_library('loc' if tag == 'local' else tag, size, rng)
+    for tag in ('lite', 'monitor'):
+        for b in libs[tag]['beverages'][:size // 10]:
+            b['id'] = b['id'].replace(tag, 'loc')
+    for tag, d in dirs.items():
+        with open(os.path.join(d, "beverages_library.json"), 'w') as f:
+            json.dump(libs[tag], f, indent=4)
+
+    ids = [b['id'] for tag in libs for b in libs[tag]['beverages']]
+    picked = rng.sample(ids, min(board, len(ids)))
+    quarter = len(picked) // 4
+    settings = {
+        "columns": {
+            "on_rotation": picked[:quarter],
+            "on_deck": picked[quarter:2 * quarter],
+            "fermenting": picked[2 * quarter:3 * quarter],
+            "lagering_or_finishing": picked[3 * quarter:]
+        },
+        "library_sources": {"use_local": True, "use_lite": True, "use_monitor": True}
+    }
+    with open(os.path.join(dirs['local'], "batchflow_settings.json"), 'w') as f:
+        json.dump(settings, f, indent=4)
+    return [b['id'] for b in libs['local']['beverages']]
+
+def bytes_written():
+    # wchar counts every byte handed to write(); Linux only
+    try:
+        with open('/proc/self/io', 'r') as f:
+            for line in f:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    # Nearest-rank
+    return ordered[max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)]
+
+def measure(op, repeat, setup=None):
+    # op(i) is timed `repeat` times, then run once more under tracemalloc for the peak
+    samples = []
+    start_bytes = bytes_written()
+    for i in range(repeat):
+        if setup: setup(i)
+        t = time.perf_counter()
+        op(i)
+        samples.append(time.perf_counter() - t)
+    end_bytes = bytes_written()
+
+    if setup: setup(repeat)
+    tracemalloc.start()
+    op(repeat)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+        'peak_kb': round(peak / 1024, 1),
+        'bytes_per_op': None if start_bytes is None else (end_bytes - start_bytes) // repeat
+    }
+
+def run_size(size, board, repeat, storage, seed):
+    rng = random.Random(seed)
+    home = tempfile.mkdtemp(prefix=f"batchflow-bench-{size}-")
+    old_home = os.environ.get('HOME')
+    os.environ['HOME'] = home
+    results = {}
+    try:
+        local_ids = build_fixture(home, size, board, rng)
+        from batchflow_logic import BatchManager
+        # Long enough that only the explicit flush below ever writes
+        manager = BatchManager(save_delay=3600, storage=storage)
+        columns = ['rotation', 'deck', 'fermenting', 'finishing']
+
+        def cold_library(i):
+            manager._source_cache.clear()
+            manager._layers = {}
+        results['load_library'] = measure(lambda i: manager.load_library(), repeat, cold_library)
+        results['load_library_cached'] = measure(lambda i: manager.load_library(), repeat)
+
+        def cold_styles(i):
+            for name in ("bjcp_cache.json", "bjcp_impressions.json"):
+                with contextlib.suppress(OSError):
+                    os.remove(os.path.join(manager.data_dir, name))
+        results['load_bjcp_styles'] = measure(lambda i: manager.load_bjcp_styles(), repeat, cold_styles)
+        results['load_bjcp_styles_cached'] = measure(lambda i: manager.load_bjcp_styles(), repeat)
+
+        edit_ids = rng.sample(local_ids, repeat + 1)
+        def save_bev(i):
+            bev = {k: v for k, v in manager.beverage_map[edit_ids[i]].items() if k != '_source'}
+            bev['name'] = f"Edited {i}"
+            manager.save_local_beverage(bev)
+            # Include the write itself, which now happens on the I/O worker
+            manager.io.drain()
+        results['save_local_beverage'] = measure(save_bev, repeat)
+
+        delete_ids = rng.sample([b for b in local_ids if b not in edit_ids], repeat + 1)
+        def delete_bev(i):
+            manager.delete_local_beverage(delete_ids[i])
+            manager.io.drain()
+        results['delete_local_beverage'] = measure(delete_bev, repeat)
+
+        def move(i):
+            src = max(columns, key=lambda c: len(manager._get_list_by_name(c)))
+            lst = manager._get_list_by_name(src)
+            dest = columns[(columns.index(src) + 1 + i % 3) % 4]
+            manager.move_batch_drag(lst[rng.randrange(len(lst))], src, dest, rng.randint(0, 50))
+            # The journal append runs on the I/O worker; count it like the beverage writes
+            manager.io.drain()
+        results['move_batch_drag'] = measure(move, repeat)
+
+        def remove(i):
+            lst = manager._get_list_by_name(columns[i % 4]) or manager.rotation_list
+            manager.remove_batch_globally(lst[len(lst) // 2])
+            manager.io.drain()
+        results['remove_batch_globally'] = measure(remove, repeat)
+
+        def save(i):
+            manager.rotation_list.insert(0, manager.rotation_list.pop())
+            manager.save_workflow()
+            manager.flush_workflow()
+        results['save_workflow'] = measure(save, repeat)
+
+        manager.flush_workflow()
+        if manager.store: manager.store.close()
+    finally:
+        if old_home is not None:
+            os.environ['HOME'] = old_home
+        shutil.rmtree(home, ignore_errors=True)
+    return results
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for size, ops in results.items():
+        for op, stats in ops.items():
+            base = baseline.get(size, {}).get(op)
+            if not base or not base.get('p50_ms'): continue
+            ratio = stats['p50_ms'] / base['p50_ms']
+            flag = "  REGRESSION" if ratio > tolerance else ""
+            print(f"  {size:>7} {op:<26} p50 {base['p50_ms']:>9.3f} -> {stats['p50_ms']:>9.3f} ms ({ratio:.2f}x){flag}")
+            if flag: regressions.append((size, op))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless BatchManager benchmarks")
+    parser.add_argument('--sizes', default=",".join(map(str, DEFAULT_SIZES)), help="library sizes per source")
+    parser.add_argument('--board', type=int, default=DEFAULT_BOARD, help="batch ids spread over the four columns")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--storage', choices=('json', 'sqlite'), default='json')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--out', help="write results as JSON (use as a later --baseline)")
+    parser.add_argument('--baseline', help="JSON results to compare against")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    results = {}
+    for size in (int(s) for s in args.sizes.split(',') if s):
+        print(f"[Bench] {size} beverages per source, {args.board} on the board, {args.storage} storage...")
+        with contextlib.redirect_stdout(io.StringIO()):
+            ops = run_size(size, args.board, args.repeat, args.storage, args.seed)
+        results[str(size)] = ops
+        for op, s in ops.items():
+            written = "-" if s['bytes_per_op'] is None else f"{s['bytes_per_op'] / 1024:.1f} KiB"
+            print(f"  {op:<26} p50 {s['p50_ms']:>9.3f} ms  p99 {s['p99_ms']:>9.3f} ms  peak {s['peak_kb']:>9.1f} KiB  written {written}")
+
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'board': args.board,
+            'repeat': args.repeat,
+            'storage': args.storage
+        },
+        'results': results
+    }
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f"[Bench] Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f).get('results', {})
+        print(f"[Bench] Compared with {args.baseline} (tolerance {args.tolerance:.2f}x):")
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
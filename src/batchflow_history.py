@@ -0,0 +1,84 @@
+from collections import deque
+
+# Undo steps kept when batchflow_settings.json has no "undo_depth"
+DEFAULT_UNDO_DEPTH = 50
+
+# An entry is the forward diff of one BatchManager transaction:
+#   {'c': {column: op}, 't': {column: (before, after)}, 'x': {column: (before, after)},
+#    'b': [[bev_id, record before, record after], ...]}
+# op is a list_change() tuple, except a reset keeps both lists: ('reset', before, after).
+# Undo applies the inverse, redo the entry itself.
+
+def make_entry(change, before, after, beverages):
+    entry = {}
+    ops = change.get('ops')
+    if ops:
+        entry['c'] = {key: (('reset', before['columns'][key], after['columns'][key]) if op[0] == 'reset' else op)
+                      for key, op in ops.items() if op is not None}
+    if 'titles' in change:
+        entry['t'] = {key: (before['titles'].get(key), after['titles'].get(key)) for key in change['titles']}
+    if 'states' in change:
+        entry['x'] = {key: (before['states'].get(key), after['states'].get(key)) for key in change['states']}
+    if beverages:
+        entry['b'] = beverages
+    return entry
+
+def invert_op(op):
+    kind = op[0]
+    if kind == 'insert': return ('remove', op[1], op[2])
+    if kind == 'remove': return ('insert', op[1], op[2])
+    if kind == 'move': return ('move', op[2], op[1], op[3])
+    return ('reset', op[2], op[1])
+
+def apply_op(ids, op):
+    # New list with op applied; ValueError if the column no longer looks like it did
+    ids = list(ids)
+    kind = op[0]
+    if kind == 'insert':
+        if op[1] > len(ids): raise ValueError("insert past the end")
+        ids[op[1]:op[1]] = op[2]
+    elif kind == 'remove':
+        if ids[op[1]:op[1] + len(op[2])] != list(op[2]): raise ValueError("removed batches are not there")
+        del ids[op[1]:op[1] + len(op[2])]
+    elif kind == 'move':
+        if op[1] >= len(ids) or ids[op[1]] != op[3]: raise ValueError("moved batch is not there")
+        ids.insert(op[2], ids.pop(op[1]))
+    else:
+        if ids != list(op[1]): raise ValueError("column changed since")
+        ids = list(op[2])
+    return ids
+
+class BoardHistory:
+    # Bounded undo/redo stacks; the oldest entry falls off once depth is reached,
+    # so memory stays flat however long the board runs.
+
+    def __init__(self, depth=DEFAULT_UNDO_DEPTH):
+        self.depth = max(0, int(depth))
+        self._undo = deque(maxlen=self.depth)
+        self._redo = deque(maxlen=self.depth)
+
+    def record(self, entry):
+        self._undo.append(entry)
+        self._redo.clear()
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def pop_undo(self):
+        return self._undo.pop() if self._undo else None
+
+    def pop_redo(self):
+        return self._redo.pop() if self._redo else None
+
+    def push_undo(self, entry):
+        self._undo.append(entry)
+
+    def push_redo(self, entry):
+        self._redo.append(entry)
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import deque
+
+from kivy.clock import Clock
+
+import batchflow_trace
+
+def job_name(fn):
+    # Span name for a queued job: the function it runs (partials unwrapped)
+    while hasattr(fn, 'func'): fn = fn.func
+    return "io:" + getattr(fn, '__qualname__', type(fn).__name__)
+
+class IOWorker:
+    # Runs disk writes on one background thread, strictly in submission order, so
+    # two writes to the same file can never overtake each other. on_done(result)
+    # and on_error(exc) are called back on the main thread through Clock.
+    # drain() blocks until everything queued so far has been written (shutdown, signals).
+
+    def __init__(self, name="batchflow-io"):
+        self.name = name
+        self._jobs = deque()
+        self._cond = threading.Condition()
+        # Queued plus running
+        self._unfinished = 0
+        self._thread = None
+        self.stats = {'jobs': 0, 'errors': 0}
+
+    def submit(self, fn, *args, on_done=None, on_error=None):
+        with self._cond:
+            self._jobs.append((fn, args, on_done, on_error))
+            self._unfinished += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def pending(self):
+        with self._cond:
+            return self._unfinished
+
+    def drain(self, timeout=None):
+        # True once every job submitted before the call has finished
+        if self._thread is threading.current_thread(): return False
+        with self._cond:
+            return self._cond.wait_for(lambda: self._unfinished == 0, timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._jobs)
+                fn, args, on_done, on_error = self._jobs.popleft()
+            # The writes themselves happen here, so this is where they are traced
+            traced = batchflow_trace.is_enabled()
+            if traced:
+                wall = time.time()
+                t = time.perf_counter()
+            try:
+                result = fn(*args)
+            except Exception as e:
+                self.stats['errors'] += 1
+                if on_error is not None:
+                    Clock.schedule_once(lambda dt, cb=on_error, e=e: cb(e))
+                else:
+                    print(f"[IO] Write failed: {e}")
+            else:
+                if on_done is not None:
+                    Clock.schedule_once(lambda dt, cb=on_done, r=result: cb(r))
+            finally:
+                if traced:
+                    batchflow_trace.record(job_name(fn), wall, time.perf_counter() - t)
+                with self._cond:
+                    self.stats['jobs'] += 1
+                    self._unfinished -= 1
+                    self._cond.notify_all()
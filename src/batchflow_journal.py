@@ -0,0 +1,89 @@
+import json
+import os
+
+# One line per board transaction, written between two snapshots of the settings file:
+#   {"s": seq, "c": {column: op}, "t": {column: title}, "x": {column: collapsed}}
+# op is BatchManager's list_change() tuple, except a reset carries the new list:
+#   ["insert", index, ids] | ["remove", index, ids] | ["move", from, to, id] | ["reset", ids]
+# The snapshot records the last seq it includes ("journal_seq"), so replay skips
+# anything older and a crash between snapshot and truncation loses nothing.
+
+def encode_change(seq, change, board):
+    # board: the state after the change, as BatchManager._board_snapshot() returns it
+    record = {'s': seq}
+    ops = change.get('ops')
+    if ops:
+        record['c'] = {key: (['reset', board['columns'][key]] if op[0] == 'reset' else list(op))
+                       for key, op in ops.items()}
+    if 'titles' in change:
+        record['t'] = {key: board['titles'].get(key) for key in change['titles']}
+    if 'states' in change:
+        record['x'] = {key: board['states'].get(key) for key in change['states']}
+    return record
+
+def apply_record(board, record):
+    # Applies one record in place; raises ValueError if it doesn't fit the board
+    for key, op in record.get('c', {}).items():
+        lst = board['columns'].get(key)
+        if lst is None: raise ValueError(f"unknown column {key}")
+        kind = op[0]
+        if kind == 'insert':
+            if op[1] > len(lst): raise ValueError(f"insert past the end of {key}")
+            lst[op[1]:op[1]] = op[2]
+        elif kind == 'remove':
+            if lst[op[1]:op[1] + len(op[2])] != op[2]: raise ValueError(f"remove does not match {key}")
+            del lst[op[1]:op[1] + len(op[2])]
+        elif kind == 'move':
+            if op[1] >= len(lst) or lst[op[1]] != op[3]: raise ValueError(f"move does not match {key}")
+            lst.insert(op[2], lst.pop(op[1]))
+        elif kind == 'reset':
+            lst[:] = op[1]
+        else:
+            raise ValueError(f"unknown op {kind}")
+    board['titles'].update(record.get('t', {}))
+    board['states'].update(record.get('x', {}))
+
+class BoardJournal:
+    # Append-only log of board changes since the last settings snapshot.
+    # append() and reset() run on the I/O worker; read() at startup.
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def read(self):
+        # Records in file order. Stops at the first torn or unreadable line (a power
+        # cut mid-append), which only ever loses that last record.
+        records = []
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.endswith("\n"): break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    if not isinstance(record, dict) or not isinstance(record.get('s'), int): break
+                    records.append(record)
+        except FileNotFoundError:
+            pass
+        return records
+
+    def append(self, record):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(record, separators=(',', ':')) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def reset(self):
+        # Called once a snapshot holding every record so far is on disk
+        self.close()
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,10 +1,109 @@
 import json
 import os
-import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from kivy.clock import Clock
 from kivy.event import EventDispatcher
-from kivy.properties import ListProperty, DictProperty, BooleanProperty
+from kivy.properties import ListProperty, DictProperty, BooleanProperty, NumericProperty
+
+from batchflow_history import BoardHistory, DEFAULT_UNDO_DEPTH, make_entry, invert_op, apply_op
+from batchflow_io import IOWorker
+from batchflow_journal import BoardJournal, encode_change, apply_record
+from batchflow_records import BeverageRecord, file_loader
+from batchflow_search import SearchIndex, normalize
+from batchflow_startup import read_settings
+from batchflow_store import SQLiteStore
+from batchflow_stream import iter_beverages, iter_beverage_offsets
+from batchflow_styles import StyleCatalog, FALLBACK_STYLES
+from batchflow_trace import traced
+from batchflow_watcher import FileWatcher, stat_key
+
+# Seconds to wait for more board changes before writing the settings file
+DEFAULT_SAVE_DELAY = 1.0
+# Seconds between a SQLite edit and refreshing the JSON copies for the keglevel apps
+EXPORT_DELAY = 5.0
+
+# Column keys used in batchflow_settings.json
+COLUMN_FILE_KEYS = {
+    'rotation': 'on_rotation',
+    'deck': 'on_deck',
+    'fermenting': 'fermenting',
+    'finishing': 'lagering_or_finishing'
+}
+
+# Library sources from lowest to highest precedence
+SOURCE_ORDER = ('local', 'lite', 'monitor')
+
+# Most rows a selector search returns
+SEARCH_LIMIT = 500
+
+# Journal records after which the board is snapshotted into the settings file again
+JOURNAL_COMPACT_RECORDS = 200
+
+# Threads parsing library sources (and the style catalog) in the background
+LOAD_WORKERS = 4
+
+def write_json_atomic(path, data, indent=4):
+    # Write to a temp file in the same directory, then rename over the target,
+    # so a crash mid-write never leaves a truncated file behind.
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def update_json_file(path, updates):
+    # Read-modify-write of the top-level keys in updates; other keys are kept.
+    # Returns the file's new stat key.
+    current_data = {}
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                current_data = json.load(f)
+        except Exception:
+            current_data = {}
+    current_data.update(updates)
+    write_json_atomic(path, current_data)
+    return stat_key(path)
+
+def list_change(before, after):
+    # Describe before -> after as one insert, remove or move; anything else is a reset
+    n, m = len(before), len(after)
+    i = 0
+    limit = min(n, m)
+    while i < limit and before[i] == after[i]:
+        i += 1
+    if n == m:
+        if i == n: return None
+        j = n - 1
+        while before[j] == after[j]:
+            j -= 1
+        if after[j] == before[i] and before[i + 1:j + 1] == after[i:j]:
+            return ('move', i, j, before[i])
+        if after[i] == before[j] and before[i:j] == after[i + 1:j + 1]:
+            return ('move', j, i, before[j])
+        return ('reset',)
+    if m > n and before[i:] == after[i + m - n:]:
+        return ('insert', i, after[i:i + m - n])
+    if n > m and before[i + n - m:] == after[i:]:
+        return ('remove', i, before[i:i + n - m])
+    return ('reset',)
 
 class BatchManager(EventDispatcher):
+    # on_library_delta(delta): a merge changed beverage_map (a source was parsed,
+    # changed on disk, or switched on or off). Local edits go through on_board_change.
+    # delta = {'sources': [tag, ...], 'added': [...], 'changed': [...], 'removed': [...]}
+    # on_board_change(change): one per transaction, listing the column keys whose
+    # batches, titles or collapse states changed, plus one op per changed column.
+    # 'refresh' lists columns showing a local beverage the transaction saved or deleted.
+    # change = {'columns': [...], 'ops': {key: op}, 'titles': [...], 'states': [...], 'refresh': [...]}
+    # op = ('insert', index, ids) | ('remove', index, ids) | ('move', from, to, id) | ('reset',)
+    __events__ = ('on_library_delta', 'on_board_change')
+
     # Reactive Properties
     rotation_list = ListProperty([])
     deck_list = ListProperty([])
@@ -30,6 +129,11 @@ class BatchManager(EventDispatcher):
     
     # The list used by the dropdown
     bjcp_styles = ListProperty([])
+
+    # Bumped on every change to all_beverages_list / bjcp_styles; never goes back,
+    # so views can cache anything derived from them until the number moves
+    library_revision = NumericProperty(0)
+    styles_revision = NumericProperty(0)
     
     source_settings = DictProperty({
         'use_local': True,
@@ -39,15 +143,85 @@ class BatchManager(EventDispatcher):
 
     has_lite = BooleanProperty(False)
     has_monitor = BooleanProperty(False)
+    # Sources still being parsed by load_library_async()
+    loading_sources = ListProperty([])
+
+    can_undo = BooleanProperty(False)
+    can_redo = BooleanProperty(False)
 
-    def __init__(self, **kwargs):
+    def __init__(self, save_delay=None, storage=None, settings=None, profiler=None, defer_library=False,
+                 undo_depth=None, **kwargs):
         super().__init__(**kwargs)
         self.data_dir = self._find_data_dir()
         self.settings_file = os.path.join(self.data_dir, "batchflow_settings.json")
+        self.save_delay = save_delay
+        self._save_pending = False
+        self._save_trigger = None
+
+        # "json" (default) or "sqlite"
+        self.storage = storage
+        self.store = None
+        self._saved_columns = {}
+        self._saved_settings = None
+        self._export_pending = False
+        self._export_trigger = None
+        # Every disk write goes through here, in order, off the UI thread
+        self.io = IOWorker()
+        # JSON storage: board transactions are appended here between settings snapshots
+        self.journal = None
+        self._journal_seq = 0
+        self._journal_count = 0
+
+        # Parsed library sources: tag -> (stat key, {id: record})
+        self._source_cache = {}
+        self._layers = {}
+        # name -> [ids]; beverage_map doubles as the id -> record index
+        self._name_index = {}
+        # Selector search: beverage index is built off-thread on first use
+        self._search_index = None
+        self._search_pending = set()
+        self._search_gen = 0
+        self._search_building = False
+        self._style_index = None
+        # BJCP styles are compiled/cached per source file and only loaded when first needed
+        self.style_catalog = StyleCatalog(
+            [
+                os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'bjcp_styles.json'),
+                os.path.join(self.data_dir, 'bjcp_styles.json'),
+                "assets/bjcp_styles.json"
+            ],
+            os.path.join(self.data_dir, 'styles'),
+            self.data_dir
+        )
+        self._styles_loaded = False
+        self._styles_lock = threading.Lock()
+        self._load_pool = None
+        self.cache_stats = {'hits': 0, 'misses': 0}
+        self._settings_key = None
+        self._watcher = None
+        # Snapshot of the board while a transaction is open, and the local
+        # beverage saves/deletes made inside it
+        self._txn = None
+        self._txn_beverages = None
+        # Undo/redo; created once load_workflow has read "undo_depth"
+        self.undo_depth = undo_depth
+        self.history = None
+        self._replaying = False
+        # column -> {batch id: occurrences}; kept up to date from each transaction's
+        # ops. A column changed inside an open transaction is looked up in the list
+        # itself until the commit; one changed outside a transaction is rebuilt lazily.
+        self._members = {}
+        self._members_pending = set()
+        for key in COLUMN_FILE_KEYS:
+            self.bind(**{key + '_list': partial(self._column_changed, key)})
         
-        self.load_workflow()
-        self.load_library()
-        self.load_bjcp_styles()
+        self.load_workflow(settings)
+        self.history = BoardHistory(self.undo_depth if self.undo_depth is not None else DEFAULT_UNDO_DEPTH)
+        if profiler: profiler.mark('workflow_load')
+        # Deferred: the caller builds its columns first, then calls load_library_async()
+        if not defer_library:
+            self.load_library()
+            if profiler: profiler.mark('library_load')
 
     def _find_data_dir(self):
         home = os.path.expanduser("~")
@@ -58,104 +232,535 @@ class BatchManager(EventDispatcher):
             except OSError: pass
         return path
 
+    @traced
     def load_bjcp_styles(self):
-        candidates = [
-            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'bjcp_styles.json'),
-            os.path.join(self.data_dir, 'bjcp_styles.json'),
-            "assets/bjcp_styles.json"
-        ]
-        
-        raw_data = []
-        for p in candidates:
-            if os.path.exists(p):
-                try:
-                    with open(p, 'r') as f:
-                        content = json.load(f)
-                        if isinstance(content, list):
-                            raw_data = content
-                        elif isinstance(content, dict):
-                            for k in ['styles', 'beverages', 'entries', 'class']:
-                                if k in content and isinstance(content[k], list):
-                                    raw_data = content[k]
-                                    break
-                        if raw_data: break
-                except Exception as e:
-                    print(f"[Logic] Error loading BJCP from {p}: {e}")
-
-        clean_list = []
-        if raw_data:
-            for item in raw_data:
-                if isinstance(item, dict):
-                    s_id = None
-                    for key in ['id', 'number', 'code', 'style_id', 'bjcp', 'category', 'category_id']:
-                        if key in item and item[key]:
-                            val = str(item[key]).strip()
-                            if len(val) < 6 and any(c.isdigit() for c in val):
-                                s_id = val
-                                break
-                    s_name = item.get('name', '') or item.get('style', '') or item.get('title', '')
-                    
-                    if s_id and s_name:
-                        clean_list.append(f"{s_id} - {s_name}")
-                    elif s_name:
-                        clean_list.append(s_name)
-                elif isinstance(item, str):
-                    clean_list.append(item)
-        
-        def bjcp_sort_key(entry):
-            parts = re.split(r'[\s\-]+', entry, 1) 
-            code = parts[0]
-            match = re.match(r"(\d+)([A-Za-z]*)", code)
-            if match:
-                return (int(match.group(1)), match.group(2))
-            return (9999, code)
-
-        if clean_list:
-            self.bjcp_styles = sorted(clean_list, key=bjcp_sort_key)
+        # Forces a (re)load; normal callers go through get_bjcp_styles()
+        with self._styles_lock:
+            styles = self.style_catalog.load(write_json_atomic)
+        self._install_styles(styles)
+
+    def _install_styles(self, styles):
+        self._style_index = None
+        self._styles_loaded = True
+        self.bjcp_styles = styles or list(FALLBACK_STYLES)
+        self.styles_revision += 1
+
+    def preload_styles(self):
+        # Compile the catalog on the load pool so the first style selector is instant
+        if not self._styles_loaded:
+            self._pool().submit(self._preload_styles)
+
+    def _preload_styles(self):
+        with self._styles_lock:
+            if self._styles_loaded: return
+            styles = self.style_catalog.load(write_json_atomic)
+        def install(dt):
+            if not self._styles_loaded: self._install_styles(styles)
+        Clock.schedule_once(install)
+
+    def get_bjcp_styles(self):
+        if not self._styles_loaded:
+            self.load_bjcp_styles()
+        return self.bjcp_styles
+
+    def get_style_impression(self, style):
+        if not self._styles_loaded:
+            self.load_bjcp_styles()
+        return self.style_catalog.impression(style)
+
+    def _local_library_path(self):
+        return os.path.join(self.data_dir, "beverages_library.json")
+
+    def _library_paths(self):
+        home = os.path.expanduser("~")
+        return {
+            'local': self._local_library_path(),
+            'lite': os.path.join(home, "keglevel_lite-data", "beverages_library.json"),
+            'monitor': os.path.join(home, "keglevel-data", "beverages_library.json")
+        }
+
+    def _stat_key(self, path):
+        return stat_key(path)
+
+    @traced
+    def _parse_library(self, filepath, source_tag):
+        # Streamed one record at a time; a malformed record is skipped, not the whole file.
+        # Each is kept as a compact BeverageRecord. The editable local source keeps every
+        # field in memory (edits and undo need them); the others re-read heavy fields
+        # from the record's byte offset on demand.
+        records = {}
+        stats = {}
+        try:
+            if source_tag == 'local':
+                for b in iter_beverages(filepath, stats=stats):
+                    if 'id' in b:
+                        records[b['id']] = BeverageRecord(b, source_tag)
+            else:
+                offsets = {}
+                loader = file_loader(filepath, stat_key(filepath), offsets)
+                for offset, b in iter_beverage_offsets(filepath, stats=stats):
+                    if 'id' in b:
+                        records[b['id']] = BeverageRecord(b, source_tag, loader)
+                        offsets[b['id']] = offset
+        except Exception as e:
+            print(f"[Logic] Error loading {source_tag}: {e}")
+        if stats.get('skipped'):
+            print(f"[Logic] Skipped {stats['skipped']} malformed beverages in {source_tag}")
+        return records
+
+    def _source_records(self, tag, path):
+        # Cached per source; a file is only parsed again when its stat key changes
+        if tag == 'local' and self.store:
+            key = ('sqlite', self.store.db_path)
         else:
-            self.bjcp_styles = ["1A - American Light Lager", "1B - American Lager", "18B - American Pale Ale", "21A - American IPA"]
+            key = self._stat_key(path)
+            if key is None:
+                # A local library we started ourselves; its first write is still queued
+                cached = self._source_cache.get(tag)
+                return cached[1] if cached is not None and cached[0] is None else None
+
+        cached = self._source_cache.get(tag)
+        if cached is not None and cached[0] == key:
+            self.cache_stats['hits'] += 1
+            return cached[1]
 
+        self.cache_stats['misses'] += 1
+        if tag == 'local' and self.store:
+            records = {}
+            for b in self.store.all_beverages():
+                records[b['id']] = BeverageRecord(b, 'local', self.store.get_beverage)
+        else:
+            records = self._parse_library(path, tag)
+        self._source_cache[tag] = (key, records)
+        return records
+
+    def _enabled_sources(self, paths):
+        self.has_lite = os.path.exists(paths['lite'])
+        self.has_monitor = os.path.exists(paths['monitor'])
+
+        # Later sources win: local < lite < monitor
+        enabled = []
+        if self._source_wanted('local'):
+            enabled.append('local')
+        if self._source_wanted('lite') and self.has_lite:
+            enabled.append('lite')
+        if self._source_wanted('monitor') and self.has_monitor:
+            enabled.append('monitor')
+        return enabled
+
+    def _source_wanted(self, tag):
+        # Switched on in the settings ("use_local" is on unless turned off)
+        return self.source_settings.get('use_' + tag, tag == 'local')
+
+    @traced
     def load_library(self):
-        home = os.path.expanduser("~")
-        path_local = os.path.join(self.data_dir, "beverages_library.json")
-        path_lite = os.path.join(home, "keglevel_lite-data", "beverages_library.json")
-        path_monitor = os.path.join(home, "keglevel-data", "beverages_library.json")
-        
-        self.has_lite = os.path.exists(path_lite)
-        self.has_monitor = os.path.exists(path_monitor)
-        
-        temp_map = {}
-        
-        def merge_file(filepath, source_tag):
-            if os.path.exists(filepath):
-                try:
-                    with open(filepath, 'r') as f:
-                        data = json.load(f)
-                        bevs = data.get('beverages', [])
-                        for b in bevs:
-                            if 'id' in b:
-                                b['_source'] = source_tag 
-                                temp_map[b['id']] = b
-                except Exception as e:
-                    print(f"[Logic] Error loading {source_tag}: {e}")
-
-        # 1. Load Local (Only if enabled)
-        if self.source_settings.get('use_local', True):
-            merge_file(path_local, 'local')
-        
-        # 2. Load Lite (if enabled)
-        if self.source_settings.get('use_lite', False) and self.has_lite:
-            merge_file(path_lite, 'lite')
-            
-        # 3. Load Monitor (if enabled)
-        if self.source_settings.get('use_monitor', False) and self.has_monitor:
-            merge_file(path_monitor, 'monitor')
+        paths = self._library_paths()
+        enabled = self._enabled_sources(paths)
+
+        layers = {}
+        changed = set()
+        for tag in enabled:
+            cached = self._source_cache.get(tag)
+            if tag in self.loading_sources and (cached is None or cached[0] != self._stat_key(paths[tag])):
+                # Still parsing in the background; keep whatever was merged before
+                if tag in self._layers: layers[tag] = self._layers[tag]
+                continue
+            records = self._source_records(tag, paths[tag])
+            if records is None: continue
+            layers[tag] = records
+            if self._layers.get(tag) is not records:
+                changed.add(tag)
+        changed.update(tag for tag in self._layers if tag not in layers)
+        if not changed: return
+
+        affected = set()
+        for tag in changed:
+            affected.update(self._layers.get(tag, ()))
+            affected.update(layers.get(tag, ()))
+        before = self.beverage_map
+        self._layers = layers
+        self._remerge(affected)
+        # Announced here, whichever caller asked for the merge
+        after = self.beverage_map
+        if after is before: return
+        delta = {
+            'sources': sorted(changed, key=SOURCE_ORDER.index),
+            'added': [i for i in affected if i in after and i not in before],
+            'changed': [i for i in affected if i in after and i in before and after[i] != before[i]],
+            'removed': [i for i in affected if i in before and i not in after]
+        }
+        if delta['added'] or delta['changed'] or delta['removed']:
+            self.dispatch('on_library_delta', delta)
+
+    def load_library_async(self):
+        # Sources that need parsing go to the load pool and are merged one by one as
+        # they arrive (announced through on_library_delta); cached, SQLite-backed and
+        # switched-off sources are merged right away.
+        paths = self._library_paths()
+        for tag in self._enabled_sources(paths):
+            if tag in self.loading_sources or (tag == 'local' and self.store): continue
+            key = self._stat_key(paths[tag])
+            cached = self._source_cache.get(tag)
+            if key is None or (cached is not None and cached[0] == key): continue
+            self.loading_sources.append(tag)
+            self._pool().submit(self._load_source, tag, paths[tag], key)
+        self.load_library()
+
+    def _pool(self):
+        if self._load_pool is None:
+            self._load_pool = ThreadPoolExecutor(max_workers=LOAD_WORKERS, thread_name_prefix="batchflow-load")
+        return self._load_pool
+
+    def _load_source(self, tag, path, key):
+        # Load-pool thread
+        records = {}
+        try:
+            records = self._parse_library(path, tag)
+        finally:
+            Clock.schedule_once(lambda dt: self._source_loaded(tag, key, records))
+
+    def _source_loaded(self, tag, key, records):
+        if tag in self.loading_sources:
+            self.loading_sources.remove(tag)
+        if self._stat_key(self._library_paths()[tag]) != key:
+            # Changed while it was parsed (the watcher leaves it alone meanwhile), so
+            # these records are already stale: parse it again in the background
+            self.load_library_async()
+            return
+        cached = self._source_cache.get(tag)
+        if cached is not None:
+            # One of our own edits already cached this file (or a newer one)
+            self.load_library()
+            return
+        self.cache_stats['misses'] += 1
+        self._apply_source_update(tag, key, records)
+
+    def stop_loading(self):
+        if self._load_pool is not None:
+            self._load_pool.shutdown(wait=False, cancel_futures=True)
+            self._load_pool = None
+
+    def _remerge(self, ids):
+        # Re-resolve only the given ids against the enabled source layers
+        layers = self._layers
+        if len(ids) > 64 and len(ids) * 8 > len(self.beverage_map):
+            temp_map = {}
+            for tag in SOURCE_ORDER:
+                if tag in layers:
+                    temp_map.update(layers[tag])
+            sorted_list = sorted(temp_map.values(), key=lambda x: x.get('name', ''))
+            name_index = {}
+            for b in sorted_list:
+                name_index.setdefault(b.get('name'), []).append(b['id'])
+            self._name_index = name_index
+            self.beverage_map = temp_map
+            self.all_beverages_list = sorted_list
+            self.library_revision += 1
+            self._reset_search_index()
+            return
+
+        order = [layers[tag] for tag in reversed(SOURCE_ORDER) if tag in layers]
+        new_map = dict(self.beverage_map)
+        new_list = list(self.all_beverages_list)
+        changed = False
+        for bev_id in ids:
+            winner = None
+            for records in order:
+                winner = records.get(bev_id)
+                if winner is not None: break
+            current = new_map.get(bev_id)
+            if current is winner: continue
+            changed = True
+            if current is not None:
+                for i in self._name_range(new_list, current.get('name', '')):
+                    if new_list[i] is current:
+                        del new_list[i]
+                        break
+                self._unindex_name(current.get('name'), bev_id)
+            if winner is None:
+                del new_map[bev_id]
+            else:
+                new_map[bev_id] = winner
+                new_list.insert(self._name_range(new_list, winner.get('name', '')).stop, winner)
+                self._name_index.setdefault(winner.get('name'), []).append(bev_id)
+        if not changed: return
+        self.beverage_map = new_map
+        self.all_beverages_list = new_list
+        self.library_revision += 1
+        self._search_pending.update(ids)
+
+    def _unindex_name(self, name, bev_id):
+        ids = self._name_index.get(name)
+        if ids and bev_id in ids:
+            ids.remove(bev_id)
+            if not ids:
+                del self._name_index[name]
+
+    def find_beverage_id(self, name):
+        ids = self._name_index.get(name)
+        return ids[0] if ids else None
+
+    def find_beverage_ids(self, name):
+        return list(self._name_index.get(name, ()))
+
+    # --- SEARCH ---
+    def search_beverages(self, query, limit=SEARCH_LIMIT):
+        # Ids matching query in list order, or None when the query is empty
+        if self._search_index is None:
+            self.prepare_search()
+            return self._scan_beverages(query, limit)
+        self._sync_search_index()
+        return self._search_index.search(query, limit)
+
+    def search_styles(self, query, limit=None):
+        if self._style_index is None:
+            self._style_index = SearchIndex()
+            for i, style in enumerate(self.get_bjcp_styles()):
+                self._style_index.add(style, (style,), i)
+        return self._style_index.search(query, limit)
+
+    def prepare_search(self):
+        # Build the beverage index on a worker thread from a snapshot of the list
+        if self._search_index is not None or self._search_building: return
+        self._search_building = True
+        self._search_pending = set()
+        gen = self._search_gen
+        snapshot = list(self.all_beverages_list)
+
+        def build():
+            index = SearchIndex()
+            for b in snapshot:
+                index.add(b['id'], (b.get('name'), b.get('bjcp')), (b.get('name', ''), b['id']))
+            Clock.schedule_once(lambda dt: self._install_search_index(index, gen))
+
+        threading.Thread(target=build, name="batchflow-search", daemon=True).start()
+
+    def _install_search_index(self, index, gen):
+        # A full library rebuild while indexing has already started a newer build
+        if gen != self._search_gen: return
+        self._search_building = False
+        self._search_index = index
+        self._sync_search_index()
+
+    def _sync_search_index(self):
+        index = self._search_index
+        for bev_id in self._search_pending:
+            b = self.beverage_map.get(bev_id)
+            if b is None:
+                index.remove(bev_id)
+            else:
+                index.add(bev_id, (b.get('name'), b.get('bjcp')), (b.get('name', ''), bev_id))
+        self._search_pending.clear()
+
+    def _reset_search_index(self):
+        had_index = self._search_index is not None or self._search_building
+        self._search_gen += 1
+        self._search_index = None
+        self._search_pending.clear()
+        if had_index:
+            self._search_building = False
+            self.prepare_search()
+
+    def _scan_beverages(self, query, limit):
+        # Used until the index is ready
+        terms = normalize(query).split()
+        if not terms: return None
+        needles = [t if len(t) >= 3 else ' ' + t for t in terms]
+        result = []
+        for b in self.all_beverages_list:
+            text = ' ' + normalize(f"{b.get('name', '')} {b.get('bjcp', '')}")
+            if all(n in text for n in needles):
+                result.append(b['id'])
+                if limit and len(result) >= limit: break
+        return result
+
+    def _name_range(self, lst, name):
+        # Slice of lst (sorted by name) holding entries with this name
+        lo, hi = 0, len(lst)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if lst[mid].get('name', '') < name: lo = mid + 1
+            else: hi = mid
+        start = lo
+        hi = len(lst)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if lst[mid].get('name', '') <= name: lo = mid + 1
+            else: hi = mid
+        return range(start, lo)
+
+    # --- BACKGROUND WATCHING ---
+    def start_watching(self, interval=2.0):
+        if self._watcher is not None: return
+        paths = self._library_paths()
+        paths['settings'] = self.settings_file
+        self._watcher = FileWatcher(paths, self._on_file_changed, interval=interval)
+        self._watcher.start()
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    @traced
+    def _on_file_changed(self, tag, path, key):
+        # Runs on the watcher thread: parse here, apply on the main thread
+        if tag == 'settings':
+            if key is None or key == self._settings_key: return
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"[Logic] Error reading changed settings: {e}")
+                return
+            Clock.schedule_once(lambda dt: self._apply_settings_update(key, data))
+            return
+
+        if tag == 'local' and self.store: return
+        # The load pool re-checks the file once its parse lands (_source_loaded)
+        if tag in self.loading_sources: return
+        if not self._source_wanted(tag):
+            # Switched off: note whether the file exists, parse it once it is switched on
+            Clock.schedule_once(lambda dt: self._source_file_seen(tag, key))
+            return
+        cached = self._source_cache.get(tag)
+        if cached is not None and cached[0] == key: return
+        records = self._parse_library(path, tag) if key is not None else {}
+        Clock.schedule_once(lambda dt: self._apply_source_update(tag, key, records))
+
+    def _source_file_seen(self, tag, key):
+        if tag == 'lite': self.has_lite = key is not None
+        elif tag == 'monitor': self.has_monitor = key is not None
+
+    def _apply_source_update(self, tag, key, records):
+        self._source_file_seen(tag, key)
+        cached = self._source_cache.get(tag)
+        if cached is not None and cached[0] == key: return
+        if key is None:
+            self._source_cache.pop(tag, None)
+        else:
+            self._source_cache[tag] = (key, records)
+        # Served from the cache just filled, so only this source is re-merged
+        self.load_library()
+
+    def _apply_settings_update(self, key, data):
+        if key == self._settings_key: return
+        self._settings_key = key
+        # Our own unsaved changes are newer than whatever is on disk
+        if self._save_pending: return
+
+        if self._journal_count and self.journal is not None:
+            # Changes so far only journaled: replay them on top of the new file, as a restart
+            # would. The journal is read on the I/O worker, behind any append still queued.
+            self._merge_settings_update(key, data)
+            return
+        self._finish_settings_update(data, self._settings_board(data), False)
+
+    def _settings_board(self, data):
+        columns = data.get('columns', {})
+        return {
+            'columns': (self._columns_snapshot() if self.store else
+                        {name: list(columns.get(file_key, [])) for name, file_key in COLUMN_FILE_KEYS.items()}),
+            'titles': data.get('titles', dict(self.column_titles)),
+            'states': data.get('states', dict(self.column_states))
+        }
+
+    def _merge_settings_update(self, key, data):
+        seq = self._journal_seq
+        self.io.submit(self._replay_journal, self._settings_board(data), data.get('journal_seq', 0),
+                       on_done=lambda board: self._journal_merged(key, data, board, seq))
+
+    def _replay_journal(self, board, seq):
+        # I/O thread
+        for record in self.journal.read():
+            if record['s'] <= seq: continue
+            try:
+                apply_record(board, record)
+            except (ValueError, TypeError, IndexError, KeyError) as e:
+                print(f"[Logic] Journal stops matching the edited settings at record {record['s']}: {e}")
+                break
+        return board
+
+    def _journal_merged(self, key, data, board, seq):
+        # A newer outside edit, or a snapshot of our own, has superseded this one
+        if key != self._settings_key or self._save_pending: return
+        if seq != self._journal_seq:
+            # Journaled while the worker was reading: read again, those appends are queued now
+            self._merge_settings_update(key, data)
+            return
+        self._finish_settings_update(data, board, True)
 
-        self.beverage_map = temp_map
-        self.all_beverages_list = sorted(temp_map.values(), key=lambda x: x.get('name', ''))
+    def _finish_settings_update(self, data, board, merged):
+        # Changes from disk are announced like local ones, but not saved back; undo
+        # entries recorded against the old board no longer apply
+        self.clear_history()
+        with self.transaction(save=False):
+            self._restore_board(board)
+        # The merged board is in neither the file nor the journal's base: snapshot it
+        if merged: self.save_workflow()
+        sources = data.get('library_sources')
+        if sources and dict(self.source_settings) != sources:
+            self.source_settings = sources
+            self.load_library()
+
+    def on_library_delta(self, delta):
+        pass
+
+    def on_board_change(self, change):
+        pass
 
+    @traced
     def save_local_beverage(self, bev_data):
-        path_local = os.path.join(self.data_dir, "beverages_library.json")
+        # One transaction: the edit is one undo step and refreshes the columns showing it
+        with self.transaction():
+            return self._save_local_beverage(bev_data)
+
+    def _save_local_beverage(self, bev_data):
+        bev_data = dict(bev_data)
+        bev_data.pop('_source', None)
+        bev_id = bev_data.get('id')
+        if self.store:
+            try:
+                before = self.store.get_beverage(bev_id)
+                self.store.upsert_beverage(bev_data)
+            except sqlite3.Error as e:
+                print(f"[Logic] Error saving beverage: {e}")
+                return False
+            self._beverage_step(bev_id, before, bev_data)
+            self._update_local_cache(bev_id, dict(bev_data))
+            self._schedule_export()
+            return True
+
+        # The library shows the edit right away and the file is rewritten on the I/O worker;
+        # the undo step takes the previous record from the cache, so it never waits on the write
+        self._beverage_step(bev_id, self._local_record(bev_id), bev_data)
+        self._update_local_cache(bev_id, dict(bev_data))
+        self.io.submit(self._write_local_beverage, self._local_library_path(), bev_data,
+                       on_done=self._local_written, on_error=partial(self._local_write_failed, "Error saving beverage"))
+        return True
+
+    def _beverage_step(self, bev_id, before, after):
+        # [id, record before, record after] for undo; also marks the columns showing it for refresh
+        step = [bev_id, before, after]
+        if self._txn_beverages is not None:
+            self._txn_beverages.append(step)
+        return step
+
+    def _local_record(self, bev_id):
+        # Full local record as last read or written (saves still queued included), or None.
+        # Local records keep every field in memory, so this never reads the file; only a
+        # layer not parsed yet is, and _update_local_cache would parse it next anyway.
+        cached = self._source_cache.get('local')
+        records = cached[1] if cached is not None else self._source_records('local', self._local_library_path())
+        record = records.get(bev_id) if records else None
+        if record is None: return None
+        data = record.to_dict()
+        data.pop('_source', None)
+        return data
+
+    def _write_local_beverage(self, path_local, bev_data):
+        # I/O thread
+        prev_key = stat_key(path_local)
         data = {"beverages": []}
         
         if os.path.exists(path_local):
@@ -179,69 +784,197 @@ class BatchManager(EventDispatcher):
         else:
             data['beverages'].append(bev_data)
             
-        try:
-            with open(path_local, 'w') as f:
-                json.dump(data, f, indent=4)
-            self.load_library()
-            return True
-        except Exception as e:
-            print(f"[Logic] Error saving beverage: {e}")
-            return False
+        write_json_atomic(path_local, data)
+        return prev_key, stat_key(path_local)
 
+    @traced
     def delete_local_beverage(self, bev_id):
-        path_local = os.path.join(self.data_dir, "beverages_library.json")
-        if not os.path.exists(path_local): return False
-        
-        try:
-            with open(path_local, 'r') as f:
-                data = json.load(f)
-            
-            original_len = len(data.get('beverages', []))
-            data['beverages'] = [b for b in data.get('beverages', []) if b.get('id') != bev_id]
-            
-            if len(data['beverages']) < original_len:
-                with open(path_local, 'w') as f:
-                    json.dump(data, f, indent=4)
+        with self.transaction():
+            return self._delete_local_beverage(bev_id)
+
+    def _delete_local_beverage(self, bev_id):
+        if self.store:
+            try:
+                before = self.store.get_beverage(bev_id)
+                deleted = self.store.delete_beverage(bev_id)
+            except sqlite3.Error as e:
+                print(f"[Logic] Delete Error: {e}")
+                return False
+            if deleted:
                 print(f"[Logic] Deleted beverage {bev_id}")
+                self._beverage_step(bev_id, before, None)
+                self._update_local_cache(bev_id, None)
+                self._schedule_export()
+            return deleted
+
+        path_local = self._local_library_path()
+        records = self._source_records('local', path_local)
+        if not records or bev_id not in records: return False
+        self._beverage_step(bev_id, self._local_record(bev_id), None)
+        self._update_local_cache(bev_id, None)
+        self.io.submit(self._delete_from_library, path_local, bev_id,
+                       on_done=self._local_written, on_error=partial(self._local_write_failed, "Delete Error"))
+        print(f"[Logic] Deleted beverage {bev_id}")
+        return True
+
+    def _delete_from_library(self, path_local, bev_id):
+        # I/O thread
+        prev_key = stat_key(path_local)
+        with open(path_local, 'r') as f:
+            data = json.load(f)
+        data['beverages'] = [b for b in data.get('beverages', []) if b.get('id') != bev_id]
+        write_json_atomic(path_local, data)
+        return prev_key, stat_key(path_local)
+
+    def _local_written(self, keys):
+        # Our own write should not look like an outside change to the cache or the watcher
+        prev_key, new_key = keys
+        cached = self._source_cache.get('local')
+        if cached is None:
+            self.load_library_async()
+        elif cached[0] == prev_key:
+            self._source_cache['local'] = (new_key, cached[1])
+        elif cached[0] != new_key:
+            # The file changed underneath us, so the cache can't be trusted
+            del self._source_cache['local']
+            self.load_library_async()
+
+    def _local_write_failed(self, message, e):
+        print(f"[Logic] {message}: {e}")
+        # Drop the optimistic edit and show what is really on disk
+        self._source_cache.pop('local', None)
+        self.load_library_async()
+
+    def _update_local_cache(self, bev_id, record):
+        # Patch the cached local layer after our own edit instead of re-parsing it
+        cached = self._source_cache.get('local')
+        if cached is None:
+            if self.store:
                 self.load_library()
-                return True
-        except Exception as e:
-            print(f"[Logic] Delete Error: {e}")
-        return False
+                return
+            path = self._local_library_path()
+            if os.path.exists(path):
+                self._source_records('local', path)
+            else:
+                # Fresh install: no file until the queued write lands, so start the layer
+                # here with a pending (None) stat key; _local_written fills the key in
+                self._source_cache['local'] = (None, {})
+            cached = self._source_cache['local']
+
+        records = cached[1]
+        if record is None:
+            records.pop(bev_id, None)
+        else:
+            records[bev_id] = BeverageRecord(record, 'local')
+        if self._layers.get('local') is records:
+            self._remerge({bev_id})
+        else:
+            self.load_library()
 
     def remove_batch_globally(self, batch_id):
-        changed = False
-        for l in [self.rotation_list, self.deck_list, self.fermenting_list, self.finishing_list]:
-            if batch_id in l:
-                l.remove(batch_id)
-                changed = True
-        if changed:
-            self.save_workflow()
-            print(f"[Logic] Removed batch {batch_id} from all columns.")
+        if not self.contains_batch(batch_id): return
+        with self.transaction():
+            # First occurrence per column, as before
+            for key in COLUMN_FILE_KEYS:
+                if self.contains_batch(batch_id, key):
+                    target = self._get_list_by_name(key)
+                    del target[target.index(batch_id)]
+        print(f"[Logic] Removed batch {batch_id} from all columns.")
 
-    def load_workflow(self):
+    @traced
+    def load_workflow(self, settings=None):
+        # settings: (data, stat key) already read by the caller, see read_settings()
         defaults = {"on_rotation": [], "on_deck": [], "fermenting": [], "lagering_or_finishing": []}
         default_titles = {'rotation': 'Rotation', 'deck': 'On Deck', 'fermenting': 'Fermenting', 'finishing': 'Finishing'}
         default_states = {'rotation': False, 'deck': False, 'fermenting': False, 'finishing': False}
         default_sources = {'use_local': True, 'use_lite': True, 'use_monitor': True}
 
-        if os.path.exists(self.settings_file):
+        data, self._settings_key = settings if settings is not None else read_settings(self.settings_file)
+        if data is not None:
             try:
-                with open(self.settings_file, 'r') as f:
-                    data = json.load(f)
-                    self.rotation_list = data.get('columns', defaults).get('on_rotation', [])
-                    self.deck_list = data.get('columns', defaults).get('on_deck', [])
-                    self.fermenting_list = data.get('columns', defaults).get('fermenting', [])
-                    self.finishing_list = data.get('columns', defaults).get('lagering_or_finishing', [])
-                    
-                    self.column_titles = data.get('titles', default_titles)
-                    self.column_states = data.get('states', default_states)
-                    self.source_settings = data.get('library_sources', default_sources)
+                self.rotation_list = data.get('columns', defaults).get('on_rotation', [])
+                self.deck_list = data.get('columns', defaults).get('on_deck', [])
+                self.fermenting_list = data.get('columns', defaults).get('fermenting', [])
+                self.finishing_list = data.get('columns', defaults).get('lagering_or_finishing', [])
+
+                self.column_titles = data.get('titles', default_titles)
+                self.column_states = data.get('states', default_states)
+                self.source_settings = data.get('library_sources', default_sources)
+                if self.save_delay is None:
+                    self.save_delay = data.get('save_delay', DEFAULT_SAVE_DELAY)
+                if self.undo_depth is None:
+                    self.undo_depth = data.get('undo_depth', DEFAULT_UNDO_DEPTH)
+                if self.storage is None:
+                    self.storage = data.get('storage', 'json')
             except Exception:
                 self._set_defaults(defaults, default_titles, default_states, default_sources)
         else:
             self._set_defaults(defaults, default_titles, default_states, default_sources)
 
+        if self.storage == 'sqlite' and self.store is None:
+            self._open_store()
+        if self.store is None and (data or {}).get('journal', True):
+            self._open_journal((data or {}).get('journal_seq', 0))
+
+    def _open_journal(self, snapshot_seq):
+        # Replay the records written after the snapshot that was just loaded
+        self.journal = BoardJournal(os.path.join(self.data_dir, "batchflow_journal.jsonl"))
+        records = self.journal.read()
+        board = self._board_snapshot()
+        seq = snapshot_seq
+        applied = 0
+        for record in records:
+            if record['s'] <= seq: continue
+            try:
+                apply_record(board, record)
+            except (ValueError, TypeError, IndexError, KeyError) as e:
+                print(f"[Logic] Journal stops matching the board at record {record['s']}: {e}")
+                break
+            seq = record['s']
+            applied += 1
+        if applied:
+            self._restore_board(board)
+            print(f"[Logic] Replayed {applied} board changes from the journal")
+        self._journal_seq = seq
+        # Fold everything into a fresh snapshot, which also drops a torn last line
+        if records or (os.path.exists(self.journal.path) and os.path.getsize(self.journal.path)):
+            self._save_pending = True
+            self._flush_pending()
+
+    def _journal_change(self, change, board):
+        # Cost is proportional to the change: one short line, not the whole settings file
+        self._journal_seq += 1
+        self._journal_count += 1
+        def failed(e):
+            print(f"[Logic] Journal Error: {e}")
+            # Fall back to a full snapshot so the change is not lost
+            self.save_workflow()
+        self.io.submit(self.journal.append, encode_change(self._journal_seq, change, board), on_error=failed)
+        if self._journal_count >= JOURNAL_COMPACT_RECORDS:
+            self.save_workflow()
+
+    def _open_store(self):
+        try:
+            self.store = SQLiteStore(os.path.join(self.data_dir, "batchflow.db"))
+            # First start on SQLite imports the JSON library and board as they are now
+            self.store.migrate_from_json(self._local_library_path(), self._columns_snapshot())
+            columns = self.store.load_columns()
+        except sqlite3.Error as e:
+            print(f"[Logic] SQLite unavailable, using JSON storage: {e}")
+            if self.store:
+                self.store.close()
+            self.store = None
+            self.storage = 'json'
+            return
+        self.rotation_list = columns.get('rotation', [])
+        self.deck_list = columns.get('deck', [])
+        self.fermenting_list = columns.get('fermenting', [])
+        self.finishing_list = columns.get('finishing', [])
+        self._saved_columns = self._columns_snapshot()
+
+    def _columns_snapshot(self):
+        return {key: list(self._get_list_by_name(key)) for key in COLUMN_FILE_KEYS}
+
     def _set_defaults(self, defaults, titles, states, sources):
         self.rotation_list = defaults['on_rotation']
         self.deck_list = defaults['on_deck']
@@ -252,74 +985,365 @@ class BatchManager(EventDispatcher):
         self.source_settings = sources
 
     def save_workflow(self):
-        current_data = {}
-        if os.path.exists(self.settings_file):
-            try:
-                with open(self.settings_file, 'r') as f:
-                    current_data = json.load(f)
-            except Exception:
-                current_data = {}
+        # Write-behind: changes inside the save window are coalesced into one write
+        self._save_pending = True
+        if self._save_trigger is None:
+            delay = self.save_delay if self.save_delay is not None else DEFAULT_SAVE_DELAY
+            self._save_trigger = Clock.create_trigger(lambda dt: self._flush_pending(), delay)
+        self._save_trigger()
+
+    def flush_workflow(self, timeout=None):
+        # Write everything still pending and wait for the I/O worker (shutdown, signals).
+        # A journal with records in it is compacted into the snapshot on the way out.
+        if self._journal_count: self._save_pending = True
+        self._flush_pending()
+        if self._export_pending:
+            self.export_json()
+        return self.io.drain(timeout)
+
+    def _write_settings(self, updates, on_done=None, compact=False):
+        # Settings file writes are queued behind any earlier write to the same file
+        def write(path, updates):
+            key = update_json_file(path, updates)
+            # The journal is only dropped once a snapshot holding all of it is on disk;
+            # later records are still queued behind this job
+            if compact: self.journal.reset()
+            return key
+        def written(key):
+            self._settings_key = key
+            if on_done: on_done()
+        def failed(e):
+            print(f"[Logic] Save Error: {e}")
+            # The journal was kept, so it still holds changes the snapshot doesn't
+            if compact: self._journal_count = max(self._journal_count, 1)
+        self.io.submit(write, self.settings_file, updates, on_done=written, on_error=failed)
+
+    def _flush_pending(self):
+        if self._save_trigger is not None:
+            self._save_trigger.cancel()
+        if not self._save_pending: return
+        self._save_pending = False
+        self._write_workflow()
 
-        current_data["columns"] = {
-            "on_rotation": list(self.rotation_list),
-            "on_deck": list(self.deck_list),
-            "fermenting": list(self.fermenting_list),
-            "lagering_or_finishing": list(self.finishing_list)
+    @traced
+    def _write_workflow(self):
+        if self.store:
+            self._write_store()
+            return
+
+        # Snapshot on the UI thread, write on the I/O worker
+        updates = {
+            "columns": {COLUMN_FILE_KEYS[key]: ids for key, ids in self._columns_snapshot().items()},
+            "titles": dict(self.column_titles),
+            "states": dict(self.column_states),
+            "library_sources": dict(self.source_settings)
         }
-        current_data["titles"] = dict(self.column_titles)
-        current_data["states"] = dict(self.column_states)
-        current_data["library_sources"] = dict(self.source_settings)
+        if self.journal is not None:
+            updates["journal_seq"] = self._journal_seq
+            self._journal_count = 0
+        self._write_settings(updates, compact=self.journal is not None)
 
+    def _write_store(self):
+        # Only columns that changed since the last write are rewritten
+        columns = self._columns_snapshot()
+        changed = {k: v for k, v in columns.items() if self._saved_columns.get(k) != v}
         try:
-            with open(self.settings_file, 'w') as f:
-                json.dump(current_data, f, indent=4)
-        except Exception as e:
+            if changed:
+                self.store.save_columns(changed)
+                self._saved_columns.update(changed)
+                self._schedule_export()
+        except sqlite3.Error as e:
             print(f"[Logic] Save Error: {e}")
 
+        # Titles, states and sources still live in the settings file
+        settings = (dict(self.column_titles), dict(self.column_states), dict(self.source_settings))
+        if settings == self._saved_settings: return
+        titles, states, sources = settings
+        def written():
+            self._saved_settings = settings
+        self._write_settings({"titles": titles, "states": states, "library_sources": sources}, written)
+
+    def _schedule_export(self):
+        self._export_pending = True
+        if self._export_trigger is None:
+            self._export_trigger = Clock.create_trigger(lambda dt: self.export_json(), EXPORT_DELAY)
+        self._export_trigger()
+
+    @traced
+    def export_json(self):
+        # Mirror the SQLite data into the JSON files other apps read
+        if not self.store: return
+        if self._export_trigger is not None:
+            self._export_trigger.cancel()
+        self._export_pending = False
+        # The database is read here (its connection belongs to this thread); the JSON is written on the I/O worker
+        def failed(e):
+            print(f"[Logic] Export Error: {e}")
+        def write_library(path, data):
+            self.io.submit(write_json_atomic, path, data, on_error=failed)
+        try:
+            self.store.export_library(self._local_library_path(), write_library)
+        except sqlite3.Error as e:
+            failed(e)
+        self._write_settings({
+            "columns": {COLUMN_FILE_KEYS[key]: ids for key, ids in self._columns_snapshot().items()}
+        })
+
+    # --- TRANSACTIONS ---
+    @contextmanager
+    def transaction(self, save=True):
+        # Board mutations inside the block are announced with one on_board_change
+        # and persisted with one save; an exception restores the board as it was.
+        # Nested transactions join the outermost one.
+        if self._txn is not None:
+            yield self
+            return
+        before = self._board_snapshot()
+        self._txn = before
+        self._txn_beverages = []
+        try:
+            yield self
+        except BaseException:
+            beverages = self._txn_beverages
+            self._txn = None
+            self._txn_beverages = None
+            self._members_pending.clear()
+            self._restore_board(before)
+            # Local beverage saves/deletes made inside the block are put back too
+            for bev_id, record, _ in reversed(beverages):
+                self._restore_beverage(bev_id, record)
+            raise
+        self._txn = None
+        beverages, self._txn_beverages = self._txn_beverages, None
+        after = self._board_snapshot()
+        change = self._board_diff(before, after)
+        self._apply_member_ops(change.get('ops', {}))
+        if not change and not beverages: return
+        if change and save:
+            if self.journal is not None:
+                self._journal_change(change, after)
+            else:
+                self.save_workflow()
+        if save and not self._replaying and self.history is not None:
+            self.history.record(make_entry(change, before, after, beverages))
+            self._sync_history()
+        if beverages:
+            ids = {step[0] for step in beverages}
+            refresh = [key for key in COLUMN_FILE_KEYS
+                       if key not in change.get('ops', {}) and any(self.contains_batch(b_id, key) for b_id in ids)]
+            if refresh: change['refresh'] = refresh
+        if change:
+            self.dispatch('on_board_change', change)
+
+    # --- UNDO / REDO ---
+    def undo(self):
+        return self._replay_history(undo=True)
+
+    def redo(self):
+        return self._replay_history(undo=False)
+
+    def clear_history(self):
+        if self.history is not None:
+            self.history.clear()
+            self._sync_history()
+
+    def _sync_history(self):
+        self.can_undo = self.history.can_undo()
+        self.can_redo = self.history.can_redo()
+
+    def _replay_history(self, undo):
+        # Re-applies one entry (inverted for undo) as a normal transaction, so it is
+        # saved, journaled and refreshes only the columns it touches
+        if self.history is None: return False
+        entry = self.history.pop_undo() if undo else self.history.pop_redo()
+        if entry is None: return False
+        try:
+            # Work out every column first, so an entry that no longer fits changes nothing
+            columns = {}
+            for key, op in entry.get('c', {}).items():
+                columns[key] = apply_op(self._get_list_by_name(key), invert_op(op) if undo else op)
+        except ValueError as e:
+            print(f"[Logic] Can't {'undo' if undo else 'redo'}, the board has changed since: {e}")
+            self.clear_history()
+            return False
+
+        side = 0 if undo else 1
+        steps = entry.get('b', [])
+        self._replaying = True
+        try:
+            with self.transaction():
+                for bev_id, *records in (reversed(steps) if undo else steps):
+                    self._restore_beverage(bev_id, records[side])
+                for key, ids in columns.items():
+                    setattr(self, key + '_list', ids)
+                for key, values in entry.get('t', {}).items():
+                    self.column_titles[key] = values[side]
+                for key, values in entry.get('x', {}).items():
+                    self.column_states[key] = values[side]
+        finally:
+            self._replaying = False
+        if undo: self.history.push_redo(entry)
+        else: self.history.push_undo(entry)
+        self._sync_history()
+        return True
+
+    def _restore_beverage(self, bev_id, record):
+        # Joins the open transaction if there is one; outside of one (a rollback) it
+        # leaves no undo entry behind
+        if record is None:
+            self._delete_local_beverage(bev_id)
+        else:
+            self._save_local_beverage(record)
+
+    def _board_snapshot(self):
+        return {
+            'columns': self._columns_snapshot(),
+            'titles': dict(self.column_titles),
+            'states': dict(self.column_states)
+        }
+
+    def _board_diff(self, before, after):
+        change = {}
+        for part in ('columns', 'titles', 'states'):
+            keys = [k for k in set(before[part]) | set(after[part]) if before[part].get(k) != after[part].get(k)]
+            if keys:
+                change[part] = sorted(keys)
+        if 'columns' in change:
+            change['ops'] = {k: list_change(before['columns'].get(k, []), after['columns'].get(k, []))
+                             for k in change['columns']}
+        return change
+
+    def _restore_board(self, snapshot):
+        for key, ids in snapshot['columns'].items():
+            if list(self._get_list_by_name(key)) != ids:
+                setattr(self, key + '_list', ids)
+        if dict(self.column_titles) != snapshot['titles']:
+            self.column_titles = snapshot['titles']
+        if dict(self.column_states) != snapshot['states']:
+            self.column_states = snapshot['states']
+
     def rename_column(self, key, new_title):
         if key in self.column_titles:
-            self.column_titles[key] = new_title
-            self.save_workflow()
+            with self.transaction():
+                self.column_titles[key] = new_title
 
     def set_column_state(self, key, is_collapsed):
         if key in self.column_states:
-            self.column_states[key] = is_collapsed
-            self.save_workflow()
+            with self.transaction():
+                self.column_states[key] = is_collapsed
 
     def add_batch(self, beverage_name, target_list_name):
-        found_id = None
-        for b in self.all_beverages_list:
-            if b.get('name') == beverage_name:
-                found_id = b.get('id'); break
-        
+        found_id = self.find_beverage_id(beverage_name)
         if not found_id: return
+        self.add_batches([found_id], target_list_name)
 
-        if target_list_name == 'rotation': self.rotation_list.insert(0, found_id)
-        elif target_list_name == 'deck': self.deck_list.insert(0, found_id)
-        elif target_list_name == 'fermenting': self.fermenting_list.insert(0, found_id)
-        elif target_list_name == 'finishing': self.finishing_list.insert(0, found_id)
-        self.save_workflow()
+    def add_batches(self, batch_ids, target_list_name):
+        # Insert many batches at the top of a column with one update and one save
+        target = self._get_list_by_name(target_list_name)
+        if target is None: return 0
+        new_ids = [b_id for b_id in batch_ids if b_id in self.beverage_map]
+        if not new_ids: return 0
+        with self.transaction():
+            setattr(self, target_list_name + '_list', new_ids + list(target))
+        return len(new_ids)
 
     def remove_batch(self, batch_id, list_name):
         target = self._get_list_by_name(list_name)
-        if target is not None and batch_id in target:
-            target.remove(batch_id)
-            self.save_workflow()
+        if target is not None and self.contains_batch(batch_id, list_name):
+            with self.transaction():
+                del target[target.index(batch_id)]
 
     def move_batch_drag(self, batch_id, source_name, dest_name, target_index=0):
         source = self._get_list_by_name(source_name)
         dest = self._get_list_by_name(dest_name)
 
         if source is not None and dest is not None:
-            if batch_id in source:
-                source.remove(batch_id)
-                if target_index < 0: target_index = 0
-                if target_index > len(dest): target_index = len(dest)
-                dest.insert(target_index, batch_id)
-                self.save_workflow()
+            if self.contains_batch(batch_id, source_name):
+                with self.transaction():
+                    del source[source.index(batch_id)]
+                    if target_index < 0: target_index = 0
+                    if target_index > len(dest): target_index = len(dest)
+                    dest.insert(target_index, batch_id)
                 return True
         return False
 
+    def move_batches(self, batch_ids, source_name, dest_name, target_index=0):
+        # Multi-select move: the selected batches keep their source order and land
+        # as one block at target_index (counted after they left the source)
+        source = self._get_list_by_name(source_name)
+        dest = self._get_list_by_name(dest_name)
+        if source is None or dest is None: return 0
+        wanted = {b_id for b_id in batch_ids if self.contains_batch(b_id, source_name)}
+        if not wanted: return 0
+        # First occurrence of each selected batch
+        picked = set()
+        for i, b_id in enumerate(source):
+            if b_id in wanted:
+                picked.add(i)
+                wanted.discard(b_id)
+                if not wanted: break
+        if not picked: return 0
+
+        moving = [source[i] for i in sorted(picked)]
+        remaining = [b_id for i, b_id in enumerate(source) if i not in picked]
+        with self.transaction():
+            if source_name == dest_name:
+                base = remaining
+            else:
+                base = list(dest)
+                setattr(self, source_name + '_list', remaining)
+            target_index = max(0, min(target_index, len(base)))
+            setattr(self, dest_name + '_list', base[:target_index] + moving + base[target_index:])
+        return len(moving)
+
+    # --- MEMBERSHIP INDEX ---
+    def find_batch(self, batch_id):
+        # [(column, position), ...] for every occurrence, in column order;
+        # positions are only scanned for in the columns that hold the batch
+        found = []
+        for key in COLUMN_FILE_KEYS:
+            if self.contains_batch(batch_id, key):
+                found.extend((key, pos) for pos, b_id in enumerate(self._get_list_by_name(key)) if b_id == batch_id)
+        return found
+
+    def contains_batch(self, batch_id, list_name=None):
+        if list_name is None:
+            return any(self.contains_batch(batch_id, key) for key in COLUMN_FILE_KEYS)
+        if list_name in self._members_pending:
+            return batch_id in self._get_list_by_name(list_name)
+        return batch_id in self._column_members(list_name)
+
+    def _column_members(self, key):
+        members = self._members.get(key)
+        if members is None:
+            members = {}
+            for b_id in self._get_list_by_name(key):
+                members[b_id] = members.get(b_id, 0) + 1
+            self._members[key] = members
+        return members
+
+    def _column_changed(self, key, *args):
+        if self._txn is not None:
+            self._members_pending.add(key)
+        else:
+            self._members.pop(key, None)
+
+    def _apply_member_ops(self, ops):
+        # Commit of a transaction: patch each changed column's counts from its op
+        self._members_pending.clear()
+        for key, op in ops.items():
+            members = self._members.get(key)
+            if members is None: continue
+            if op[0] == 'insert':
+                for b_id in op[2]:
+                    members[b_id] = members.get(b_id, 0) + 1
+            elif op[0] == 'remove':
+                for b_id in op[2]:
+                    if members[b_id] == 1: del members[b_id]
+                    else: members[b_id] -= 1
+            elif op[0] == 'reset':
+                del self._members[key]
+
     def _get_list_by_name(self, name):
         if name == 'rotation': return self.rotation_list
         elif name == 'deck': return self.deck_list
@@ -1,9 +1,15 @@
 import os
 import sys
 import signal
-import json 
 import uuid
-from functools import partial
+import math
+from weakref import WeakSet
+from bisect import bisect_left
+
+from batchflow_startup import StartupProfiler, read_settings
+import batchflow_trace
+from batchflow_trace import traced
+STARTUP = StartupProfiler()
 
 # --- 0. PRE-LOAD WINDOW SETTINGS ---
 def find_data_dir():
@@ -17,31 +23,43 @@ def find_data_dir():
 
 DATA_DIR = find_data_dir()
 SETTINGS_FILE = os.path.join(DATA_DIR, "batchflow_settings.json")
+TRACE_FILE = os.path.join(DATA_DIR, "batchflow_trace.jsonl")
 
 # TARGET MINIMUMS
 MIN_WIDTH = 800
 MIN_HEIGHT = 418
 
+# Columns with more cards than this switch to a RecycleView
+VIRTUAL_COLUMN_THRESHOLD = 150
+
+# Detached BatchCards kept for reuse: one full plain column's worth
+CARD_POOL_SIZE = VIRTUAL_COLUMN_THRESHOLD
+
+# Seconds shutdown waits for queued disk writes
+SHUTDOWN_DRAIN_TIMEOUT = 5.0
+
 # Defaults
 init_width = 800
 init_height = 418
 init_left = None
 init_top = None
 
+# Parsed once; BatchManager reuses the same data instead of reading the file again
+SETTINGS = read_settings(SETTINGS_FILE)
 try:
-    if os.path.exists(SETTINGS_FILE):
-        with open(SETTINGS_FILE, 'r') as f:
-            full_data = json.load(f)
-            w_data = full_data.get('window', {})
-            loaded_w = w_data.get('width', 800)
-            loaded_h = w_data.get('height', 418)
-            init_width = max(loaded_w, MIN_WIDTH)
-            init_height = max(loaded_h, MIN_HEIGHT)
-            init_left = w_data.get('left', None)
-            init_top = w_data.get('top', None)
-            print(f"[System] Loaded settings: {init_width}x{init_height}")
+    if SETTINGS[0] is not None:
+        w_data = SETTINGS[0].get('window', {})
+        loaded_w = w_data.get('width', 800)
+        loaded_h = w_data.get('height', 418)
+        init_width = max(loaded_w, MIN_WIDTH)
+        init_height = max(loaded_h, MIN_HEIGHT)
+        init_left = w_data.get('left', None)
+        init_top = w_data.get('top', None)
+        print(f"[System] Loaded settings: {init_width}x{init_height}")
 except Exception as e:
     print(f"[System] Could not load window settings: {e}")
+batchflow_trace.configure(SETTINGS[0])
+STARTUP.mark('settings_parse')
 
 # --- 1. CONFIG ---
 os.environ['SDL_VIDEO_X11_WMCLASS'] = "BatchFlow"
@@ -74,19 +92,44 @@ from kivy.clock import Clock
 from kivy.properties import ObjectProperty, StringProperty, ListProperty, BooleanProperty, DictProperty, NumericProperty
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
+from kivy.uix.label import Label
 from kivy.uix.floatlayout import FloatLayout
 from kivy.uix.popup import Popup
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
 from kivy.core.window import Window
+from kivy.metrics import dp
 
 # --- IMPORT LOGIC ---
-from batchflow_logic import BatchManager
+from batchflow_logic import BatchManager, update_json_file
+STARTUP.mark('imports')
+
+def save_window_settings(window):
+    # Runs on the I/O worker at shutdown, when Clock callbacks no longer fire, so it reports itself
+    try:
+        update_json_file(SETTINGS_FILE, {'window': window})
+        print(f"[System] Saved window settings: {window}")
+    except Exception as e:
+        print(f"[System] Failed to save window settings: {e}")
 
 # --- SIGNAL HANDLING ---
 def handle_signal(signum, frame):
+    # Don't drop board changes still waiting in the write-behind window or on the I/O worker
+    app = App.get_running_app()
+    if app and app.manager:
+        if not app.manager.flush_workflow(timeout=SHUTDOWN_DRAIN_TIMEOUT):
+            print("[System] Pending writes did not finish before exit")
     os._exit(0)
 signal.signal(signal.SIGTERM, handle_signal)
 signal.signal(signal.SIGINT, handle_signal)
 
+# kill -USR1 <pid> dumps the trace buffer without stopping the app
+def handle_trace_signal(signum, frame):
+    if batchflow_trace.is_enabled():
+        count = batchflow_trace.export_jsonl(TRACE_FILE)
+        print(f"[Trace] Exported {count} spans to {TRACE_FILE}")
+if hasattr(signal, 'SIGUSR1'):
+    signal.signal(signal.SIGUSR1, handle_trace_signal)
+
 # --- LOAD KV ---
 kv_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'batchflow_ui.kv')
 try:
@@ -94,6 +137,7 @@ try:
 except Exception as e:
     print(f"CRITICAL: Could not load KV file: {e}")
     sys.exit(1)
+STARTUP.mark('kv_load')
 
 # --- WIDGET CLASSES ---
 
@@ -121,6 +165,26 @@ class HeaderButton(Button):
 class TrashDock(BoxLayout):
     pass
 
+class TraceOverlay(Label):
+    # Recent frame times and the slowest traced operations, refreshed twice a second
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        Clock.schedule_interval(self.update, 0.5)
+
+    def update(self, dt):
+        frames = sorted(batchflow_trace.STATE.frames)
+        lines = []
+        if frames:
+            p50 = frames[len(frames) // 2] * 1000
+            worst = frames[-1] * 1000
+            lines.append(f"frame p50 {p50:.1f} ms  max {worst:.1f} ms  ({Clock.get_fps():.0f} fps)")
+        app = App.get_running_app()
+        if app and getattr(app, 'card_pool', None):
+            lines.append(app.card_pool.summary())
+        for name, _, seconds, _ in batchflow_trace.slowest(6):
+            lines.append(f"{seconds * 1000:8.1f} ms  {name}")
+        self.text = "\n".join(lines)
+
 class ConfirmPopupContent(BoxLayout):
     cancel_func = ObjectProperty(None)
     confirm_func = ObjectProperty(None)
@@ -137,6 +201,8 @@ class SourceSelectPopup(Popup):
     use_monitor = BooleanProperty(False)
     has_lite = BooleanProperty(False)
     has_monitor = BooleanProperty(False)
+    # Source tags still loading in the background
+    loading = ListProperty([])
 
     def on_open(self):
         app = App.get_running_app()
@@ -146,25 +212,118 @@ class SourceSelectPopup(Popup):
         self.use_monitor = mgr.source_settings.get('use_monitor', False)
         self.has_lite = mgr.has_lite
         self.has_monitor = mgr.has_monitor
+        self.loading = list(mgr.loading_sources)
+        mgr.bind(loading_sources=self._on_loading)
+
+    def on_dismiss(self):
+        App.get_running_app().manager.unbind(loading_sources=self._on_loading)
+
+    def _on_loading(self, mgr, tags):
+        self.loading = list(tags)
 
     def on_toggle(self, key, value):
         app = App.get_running_app()
         mgr = app.manager
         mgr.source_settings[key] = value
         mgr.save_workflow()
-        mgr.load_library()
+        # Newly enabled sources are parsed in the background and refresh the board when merged
+        mgr.load_library_async()
         app.refresh_ui()
 
 # --- NEW: IN-COLUMN PANELS ---
 
+class SelectorRows:
+    # RecycleView rows shared by every column's selector of one kind. refresh() only
+    # rebuilds when the manager's revision has moved, and even then keeps the row of
+    # any entry whose record still compares equal, so the rows list is the only new object.
+
+    def __init__(self, make_row):
+        self.make_row = make_row
+        self.revision = None
+        self.rows = []
+        self.by_key = {}
+        self._records = {}
+        self.stats = {'rebuilds': 0, 'built': 0, 'reused': 0}
+
+    def refresh(self, revision, entries):
+        # entries: (key, record) pairs in display order
+        if revision == self.revision: return False
+        old_rows, old_records = self.by_key, self._records
+        rows, by_key, records = [], {}, {}
+        built = 0
+        for key, record in entries:
+            row = old_rows.get(key)
+            if row is None or old_records[key] != record:
+                row = self.make_row(key, record)
+                built += 1
+            rows.append(row)
+            by_key[key] = row
+            records[key] = record
+        self.rows, self.by_key, self._records = rows, by_key, records
+        self.revision = revision
+        self.stats['rebuilds'] += 1
+        self.stats['built'] += built
+        self.stats['reused'] += len(rows) - built
+        return True
+
+def _selector_panel(row, panel_class):
+    # RecycleView rows sit two levels below their panel (layout, view)
+    w = row.parent
+    while w is not None and not isinstance(w, panel_class):
+        w = w.parent
+    return w
+
 class BeverageSelectRow(Button):
-    pass
+    bev_id = StringProperty("")
+
+    @staticmethod
+    def row_data(bev_id, bev):
+        src = bev.get('_source', 'local')
+        bg_col = [0.2, 0.2, 0.2, 1]
+        if src == 'lite': bg_col = [0.15, 0.25, 0.15, 1]
+        elif src == 'monitor': bg_col = [0.25, 0.15, 0.15, 1]
+        return {'text': bev.get('name', 'Unknown'), 'background_color': bg_col, 'bev_id': bev_id}
+
+    def on_release(self):
+        # Rows are shared by every column, so the panel showing this one takes the pick
+        panel = _selector_panel(self, BeverageSelectorPanel)
+        if panel and panel.column_ref:
+            panel.column_ref._select_beverage(self.bev_id)
 
 class StyleSelectRow(Button):
-    pass
+    @staticmethod
+    def row_data(style, _):
+        return {'text': style}
+
+    def on_release(self):
+        panel = _selector_panel(self, BeverageStyleSelectorPanel)
+        if panel and panel.column_ref:
+            panel.column_ref._select_style(self.text)
 
 class BeverageSelectorPanel(BoxLayout):
     column_ref = ObjectProperty(None)
+    _all_rows = []
+    _rows_by_id = {}
+
+    def set_rows(self, rows):
+        # rows: the shared SelectorRows; the view is only handed a new list after a rebuild
+        fresh = rows.rows is not self._all_rows
+        self._all_rows = rows.rows
+        self._rows_by_id = rows.by_key
+        if self.ids.search_input.text:
+            # on_text -> filter("") shows every row
+            self.ids.search_input.text = ""
+        elif fresh:
+            self.ids.rv_options.data = rows.rows
+
+    def filter(self, text):
+        app = App.get_running_app()
+        ids = app.manager.search_beverages(text) if app and app.manager else None
+        if ids is None:
+            self.ids.rv_options.data = self._all_rows
+        else:
+            rows = self._rows_by_id
+            self.ids.rv_options.data = [rows[i] for i in ids if i in rows]
     
     def cancel(self):
         if self.column_ref:
@@ -176,6 +335,26 @@ class BeverageSelectorPanel(BoxLayout):
 
 class BeverageStyleSelectorPanel(BoxLayout):
     column_ref = ObjectProperty(None)
+    _all_rows = []
+    _rows_by_style = {}
+
+    def set_rows(self, rows):
+        fresh = rows.rows is not self._all_rows
+        self._all_rows = rows.rows
+        self._rows_by_style = rows.by_key
+        if self.ids.search_input.text:
+            self.ids.search_input.text = ""
+        elif fresh:
+            self.ids.rv_styles.data = rows.rows
+
+    def filter(self, text):
+        app = App.get_running_app()
+        styles = app.manager.search_styles(text) if app and app.manager else None
+        if styles is None:
+            self.ids.rv_styles.data = self._all_rows
+        else:
+            rows = self._rows_by_style
+            self.ids.rv_styles.data = [rows[s] for s in styles if s in rows]
     
     def cancel(self):
         if self.column_ref:
@@ -216,11 +395,13 @@ class BeverageEditorPanel(BoxLayout):
 
     def confirm_delete(self):
         app = App.get_running_app()
-        if app.manager.delete_local_beverage(self.bev_id):
-            app.manager.remove_batch_globally(self.bev_id)
-            if self.column_ref:
-                self.column_ref.show_cards()
-            app.refresh_ui()
+        # One undo step brings back both the beverage and its cards
+        with app.manager.transaction():
+            deleted = app.manager.delete_local_beverage(self.bev_id)
+            if deleted:
+                app.manager.remove_batch_globally(self.bev_id)
+        if deleted and self.column_ref:
+            self.column_ref.show_cards()
 
     def save(self):
         name = self.bev_name.strip()
@@ -240,15 +421,15 @@ class BeverageEditorPanel(BoxLayout):
 
         app = App.get_running_app()
         if app.manager:
-            success = app.manager.save_local_beverage(new_bev)
-            if success:
-                if self.column_ref and not self.bev_id:
-                    app.manager.add_batch(name, self.column_ref.stage_key)
-                app.refresh_ui()
-                if self.column_ref:
-                    self.column_ref.show_cards()
+            # The columns showing it refresh through on_board_change; undo reverts save and add together
+            with app.manager.transaction():
+                success = app.manager.save_local_beverage(new_bev)
+                if success and self.column_ref and not self.bev_id:
+                    app.manager.add_batches([target_id], self.column_ref.stage_key)
+            if success and self.column_ref:
+                self.column_ref.show_cards()
 
-class BatchCard(BoxLayout):
+class BatchCard(RecycleDataViewBehavior, BoxLayout):
     batch_id = StringProperty("")
     stage_key = StringProperty("")
     bv_name = StringProperty("")
@@ -259,6 +440,42 @@ class BatchCard(BoxLayout):
     background_color = ListProperty([0.2, 0.2, 0.2, 1])
     is_dragging = BooleanProperty(False)
 
+    # Position of this card's id in the manager list (cards for hidden ids are skipped)
+    list_pos = -1
+    # Set while the card is a RecycleView row, None for plain cards
+    rv_index = None
+    _drag_source = None
+    # Column currently showing this drag's drop marker
+    _hover_col = None
+    # Set on dragged cards no column owns any more; they go back to the pool when dropped
+    _pool_on_drop = False
+
+    @staticmethod
+    def beverage_fields(data):
+        src = data.get('_source', 'local')
+        if src == 'lite': bg_col = [0.15, 0.25, 0.15, 1]
+        elif src == 'monitor': bg_col = [0.25, 0.15, 0.15, 1]
+        else: bg_col = [0.2, 0.2, 0.2, 1]
+        val_ibu = data.get('ibu')
+        return {
+            'bv_name': data.get('name', 'Unknown'),
+            'bv_style': data.get('bjcp', ''),
+            'bv_abv': str(data.get('abv', '--')),
+            'bv_ibu': str(val_ibu) if val_ibu is not None else "--",
+            'bv_name_color': [1, 1, 1, 1],
+            'background_color': bg_col
+        }
+
+    def set_beverage(self, data):
+        # Kivy only dispatches when a value actually changes, so this is cheap for unchanged cards
+        for key, value in self.beverage_fields(data).items():
+            setattr(self, key, value)
+
+    def refresh_view_attrs(self, rv, index, data):
+        self.rv_index = index
+        self.opacity = 1
+        return super().refresh_view_attrs(rv, index, data)
+
     def on_touch_down(self, touch):
         if self.collide_point(*touch.pos):
             if touch.is_double_tap:
@@ -280,6 +497,7 @@ class BatchCard(BoxLayout):
             if self.parent == App.get_running_app().root:
                 self.pos = (touch.x + self._drag_touch_offset[0], 
                             touch.y + self._drag_touch_offset[1])
+                self.show_drop_slot(touch)
             return True
         return super().on_touch_move(touch)
 
@@ -291,20 +509,53 @@ class BatchCard(BoxLayout):
             return True
         return super().on_touch_up(touch)
 
+    @traced
     def start_dragging(self, touch):
-        self.is_dragging = True
-        self.opacity = 0.8
         app = App.get_running_app()
         if app.trash_dock:
             app.trash_dock.opacity = 1
         win_pos = self.to_window(*self.pos)
-        if self.parent:
-            self.parent.remove_widget(self)
-        app.root.add_widget(self)
-        self.size_hint = (None, None)
-        self.width = 260
-        self.height = 110
-        self.pos = win_pos
+
+        if self.rv_index is not None:
+            # RecycleView rows belong to the view; drag a stand-in card and hide the row
+            card = app.card_pool.acquire()
+            for key in ('batch_id', 'stage_key', 'bv_name', 'bv_style', 'bv_abv',
+                        'bv_ibu', 'bv_name_color', 'background_color', 'list_pos'):
+                setattr(card, key, getattr(self, key))
+            card._drag_touch_offset = self._drag_touch_offset
+            card._drag_source = self
+            card._pool_on_drop = True
+            self.opacity = 0
+            touch.ungrab(self)
+            touch.grab(card)
+        else:
+            card = self
+            if self.parent:
+                self.parent.remove_widget(self)
+
+        card.is_dragging = True
+        card.opacity = 0.8
+        app.root.add_widget(card)
+        card.size_hint = (None, None)
+        card.width = 260
+        card.height = 110
+        card.pos = win_pos
+
+    def show_drop_slot(self, touch):
+        # Runs at pointer rate: a collide per column and one bisect in the hovered one
+        app = App.get_running_app()
+        cx, cy = touch.pos
+        target = None
+        if not (app.trash_dock and app.trash_dock.collide_point(cx, cy)):
+            for col_widget in app.columns.values():
+                if col_widget.collide_point(cx, cy):
+                    target = col_widget
+                    break
+        if self._hover_col is not target:
+            if self._hover_col: self._hover_col.drop_marker_y = None
+            self._hover_col = target
+        if target:
+            target.drop_marker_y = target.drop_slot(cy)[1]
 
     def stop_dragging(self, touch=None):
         self.is_dragging = False
@@ -312,10 +563,19 @@ class BatchCard(BoxLayout):
         app = App.get_running_app()
         if app.trash_dock:
             app.trash_dock.opacity = 0
+        if self._hover_col:
+            self._hover_col.drop_marker_y = None
+            self._hover_col = None
         self._handle_drop(touch)
+        if self._drag_source:
+            self._drag_source.opacity = 1
+            self._drag_source = None
         if self.parent:
             self.parent.remove_widget(self)
+        if self._pool_on_drop:
+            app.card_pool.release(self)
 
+    @traced
     def _handle_drop(self, touch=None):
         app = App.get_running_app()
         if not app: return
@@ -334,31 +594,14 @@ class BatchCard(BoxLayout):
                 break
         
         if target_col:
-            if target_col.is_collapsed:
-                container = target_col.ids.card_container
-                insert_idx = len(container.children)
-            else:
-                container = target_col.ids.card_container
-                existing_cards = container.children
-                sorted_cards = sorted(
-                    existing_cards, 
-                    key=lambda c: c.to_window(c.x, c.y)[1], 
-                    reverse=True
-                )
-                insert_idx = len(sorted_cards)
-                for i, card in enumerate(sorted_cards):
-                    _, card_y = card.to_window(card.x, card.y)
-                    card_cy = card_y + (card.height / 2)
-                    if cy > card_cy:
-                        insert_idx = i
-                        break
-            
-            success = app.manager.move_batch_drag(
+            insert_idx = target_col.get_drop_index(cy, self)
+            app.manager.move_batch_drag(
                 self.batch_id, self.stage_key, target_col.stage_key, target_index=insert_idx
             )
-            if not success: app.refresh_ui()
-        else:
-            app.refresh_ui()
+        # A column card no board change re-placed (failed, no-op or missed drop) goes back;
+        # a RecycleView row was only hidden and stop_dragging shows it again
+        if self._drag_source is None and not self._pool_on_drop:
+            app.refresh_column(self.stage_key)
 
     def show_delete_confirmation(self):
         app = App.get_running_app()
@@ -367,23 +610,108 @@ class BatchCard(BoxLayout):
         content = ConfirmPopupContent()
         content.ids.msg_label.text = msg
         popup = Popup(title="Confirmation", content=content, size_hint=(None, None), size=(500, 300), auto_dismiss=False)
+        # This card may be back in the pool by the time the popup answers
+        batch_id, stage_key = self.batch_id, self.stage_key
+        detached = self._drag_source is None
         def do_cancel():
             popup.dismiss()
-            app.refresh_ui()
+            if detached: app.refresh_column(stage_key)
         def do_delete():
             popup.dismiss()
-            app.manager.remove_batch(self.batch_id, self.stage_key)
-            app.refresh_ui()
+            # The removal's board change updates the column
+            app.manager.remove_batch(batch_id, stage_key)
         content.cancel_func = do_cancel
         content.confirm_func = do_delete
         popup.open()
 
+    def reset(self):
+        # Back to a fresh card's state (a drag leaves size, opacity and flags behind)
+        self.is_dragging = False
+        self.opacity = 1
+        self.size_hint = (1, None)
+        self.height = dp(70)
+        self.pos = (0, 0)
+        self.batch_id = ""
+        self.stage_key = ""
+        self.list_pos = -1
+        self.rv_index = None
+        self._drag_source = None
+        self._hover_col = None
+        self._pool_on_drop = False
+
+class CardPool:
+    # Bounded free list of detached BatchCards shared by every column and drag, so
+    # refreshes reuse cards instead of re-applying the <BatchCard> rule each time.
+    # Cards beyond the limit are left to the GC.
+
+    def __init__(self, limit=CARD_POOL_SIZE):
+        self.limit = limit
+        self._free = []
+        self.stats = {'hits': 0, 'misses': 0, 'released': 0, 'dropped': 0, 'peak': 0}
+
+    def acquire(self):
+        if self._free:
+            self.stats['hits'] += 1
+            return self._free.pop()
+        self.stats['misses'] += 1
+        return BatchCard()
+
+    def release(self, card):
+        if card.parent: card.parent.remove_widget(card)
+        if len(self._free) >= self.limit:
+            self.stats['dropped'] += 1
+            return
+        card.reset()
+        self._free.append(card)
+        self.stats['released'] += 1
+        self.stats['peak'] = max(self.stats['peak'], len(self._free))
+
+    def hit_rate(self):
+        total = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / total if total else 0.0
+
+    def summary(self):
+        return (f"card pool {self.hit_rate() * 100:.0f}% hits ({self.stats['hits']}/"
+                f"{self.stats['hits'] + self.stats['misses']}), {len(self._free)} free, peak {self.stats['peak']}")
+
+class CardStack(BoxLayout):
+    # Card container that reports every finished layout pass; cards only get their
+    # final positions there, so the column's drop slots are rebuilt after it
+    __events__ = ('on_layout',)
+
+    def do_layout(self, *args):
+        super().do_layout(*args)
+        self.dispatch('on_layout')
+
+    def on_layout(self):
+        pass
+
 class StageColumn(BoxLayout):
     title = StringProperty("")
     vertical_title = StringProperty("") 
     stage_key = StringProperty("")
     available_beverages = ListProperty([])
     is_collapsed = BooleanProperty(False)
+    is_virtual = BooleanProperty(False)
+    # library_revision available_beverages was last built from
+    _selector_revision = None
+    # Insertion marker while a card hovers over the column (column space), None when hidden
+    drop_marker_y = NumericProperty(None, allownone=True)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._cards = {}
+        self._list_len = 0
+        # Drop slots in window space, built on first use after a layout or scroll
+        self._slots = None
+        self.bind(is_collapsed=self.invalidate_slots, is_virtual=self.invalidate_slots)
+        self.ids.card_container.bind(on_layout=self.invalidate_slots)
+        for view in (self.ids.card_scroll, self.ids.rv_cards):
+            view.bind(pos=self.invalidate_slots, size=self.invalidate_slots, scroll_y=self.invalidate_slots)
+        self.ids.rv_cards_layout.bind(size=self.invalidate_slots)
+
+    def invalidate_slots(self, *args):
+        self._slots = None
 
     def on_title(self, instance, value):
         self.vertical_title = "\n".join(list(value))
@@ -395,31 +723,19 @@ class StageColumn(BoxLayout):
             app.manager.set_column_state(self.stage_key, self.is_collapsed)
     
     # --- MODE SWITCHING LOGIC ---
+    @traced
     def open_selector(self):
         app = App.get_running_app()
-        all_bevs = []
+        rows = app.beverage_rows
         if app.manager:
             app.manager.load_library()
-            all_bevs = app.manager.all_beverages_list
-            self.available_beverages = [b['name'] for b in all_bevs]
-        
-        panel = self.ids.selector_panel
-        data_list = []
-        
-        for bev in all_bevs:
-            b_name = bev.get('name', 'Unknown')
-            src = bev.get('_source', 'local')
-            bg_col = [0.2, 0.2, 0.2, 1]
-            if src == 'lite': bg_col = [0.15, 0.25, 0.15, 1]
-            elif src == 'monitor': bg_col = [0.25, 0.15, 0.15, 1]
-                
-            data_list.append({
-                'text': b_name,
-                'background_color': bg_col,
-                'on_release': partial(self._select_beverage, b_name)
-            })
-            
-        panel.ids.rv_options.data = data_list
+            app.manager.prepare_search()
+            rows.refresh(app.manager.library_revision, ((b['id'], b) for b in app.manager.all_beverages_list))
+            if self._selector_revision != rows.revision:
+                self._selector_revision = rows.revision
+                self.available_beverages = [r['text'] for r in rows.rows]
+
+        self.ids.selector_panel.set_rows(rows)
         self.ids.sm_col.transition.direction = 'down'
         self.ids.sm_col.current = 'view_select'
 
@@ -459,16 +775,10 @@ class StageColumn(BoxLayout):
 
     def open_style_selector(self):
         app = App.get_running_app()
-        styles = app.manager.bjcp_styles
-        
-        panel = self.ids.style_panel
-        data_list = []
-        for s in styles:
-            data_list.append({
-                'text': s,
-                'on_release': partial(self._select_style, s)
-            })
-        panel.ids.rv_styles.data = data_list
+        styles = app.manager.get_bjcp_styles()
+        rows = app.style_rows
+        rows.refresh(app.manager.styles_revision, ((st, st) for st in styles))
+        self.ids.style_panel.set_rows(rows)
         
         self.ids.sm_col.transition.direction = 'left'
         self.ids.sm_col.current = 'view_style'
@@ -477,10 +787,10 @@ class StageColumn(BoxLayout):
         self.ids.sm_col.transition.direction = 'right'
         self.ids.sm_col.current = 'view_create'
 
-    def _select_beverage(self, bev_name):
+    def _select_beverage(self, bev_id):
         app = App.get_running_app()
         if app.manager:
-            app.manager.add_batch(bev_name, self.stage_key)
+            app.manager.add_batches([bev_id], self.stage_key)
         self.show_cards()
 
     def _select_style(self, style_name):
@@ -505,37 +815,232 @@ class StageColumn(BoxLayout):
         def do_cancel(): popup.dismiss()
         popup.save_func = do_save
         popup.cancel_func = do_cancel
+        popup.bind(on_open=lambda *a: setattr(input_widget, 'focus', True))
         popup.open()
-        Clock.schedule_once(lambda dt: setattr(input_widget, 'focus', True), 0.1)
 
+    @traced
     def update_cards(self, batch_ids_list):
-        container = self.ids.card_container
-        container.clear_widgets()
+        # Unwrap the ids proxy so identity checks against card.parent work
+        container = self.ids.card_container.__self__
         app = App.get_running_app()
-        if not app or not app.manager: return
-
-        for b_id in batch_ids_list:
-            data = app.manager.beverage_map.get(b_id)
+        if not app or not app.manager:
+            container.clear_widgets()
+            self._cards = {}
+            return
+        pool = app.card_pool
+        bev_map = app.manager.beverage_map
+
+        # Cards are keyed by (id, occurrence) so repeated ids in one column stay stable
+        new_keys = []
+        positions = []
+        seen = {}
+        for pos, b_id in enumerate(batch_ids_list):
             # CHANGED: Skip hidden items instead of creating "Unknown" cards
-            if not data: continue 
-            
-            card = BatchCard()
-            card.batch_id = b_id
+            if b_id not in bev_map: continue
+            n = seen.get(b_id, 0)
+            seen[b_id] = n + 1
+            new_keys.append((b_id, n))
+            positions.append(pos)
+        self._list_len = len(batch_ids_list)
+
+        if len(new_keys) > VIRTUAL_COLUMN_THRESHOLD:
+            if self._cards:
+                self._release_cards(self._cards.values())
+                self._cards = {}
+            self.is_virtual = True
+            self._update_rows(new_keys, positions, bev_map)
+            return
+        if self.is_virtual:
+            self.ids.rv_cards.data = []
+            self.is_virtual = False
+
+        old_cards = self._cards
+        new_cards = {}
+        for key in new_keys:
+            card = old_cards.pop(key, None)
+            # A card still being dragged is replaced; a detached one is simply put back below
+            if card is not None and card.parent is not None and card.parent is not container:
+                card._pool_on_drop = True
+                card = None
+            if card is None:
+                card = pool.acquire()
+                card.batch_id = key[0]
             card.stage_key = self.stage_key
-            
-            card.bv_name = data.get('name', 'Unknown')
-            card.bv_style = data.get('bjcp', '')
-            card.bv_abv = str(data.get('abv', '--'))
-            val_ibu = data.get('ibu')
-            card.bv_ibu = str(val_ibu) if val_ibu is not None else "--"
-            card.bv_name_color = [1, 1, 1, 1]
-            
-            src = data.get('_source', 'local')
-            if src == 'lite': card.background_color = [0.15, 0.25, 0.15, 1]
-            elif src == 'monitor': card.background_color = [0.25, 0.15, 0.15, 1]
-            else: card.background_color = [0.2, 0.2, 0.2, 1]
-                
-            container.add_widget(card)
+            card.set_beverage(bev_map[key[0]])
+            new_cards[key] = card
+        for key, pos in zip(new_keys, positions):
+            new_cards[key].list_pos = pos
+
+        self._release_cards(old_cards.values())
+        self._cards = new_cards
+
+        # Keep the longest run of cards already in the right relative order,
+        # then move/insert everything else around it.
+        current = [c for c in reversed(container.children)]
+        old_pos = {id(c): i for i, c in enumerate(current)}
+        seq = [old_pos.get(id(new_cards[k]), -1) for k in new_keys]
+        stable = self._longest_increasing(seq)
+
+        for i, key in enumerate(new_keys):
+            card = new_cards[key]
+            if i not in stable and card.parent is container:
+                container.remove_widget(card)
+
+        for i, key in enumerate(new_keys):
+            card = new_cards[key]
+            if card.parent is not container:
+                container.add_widget(card, index=len(container.children) - i)
+
+    def _release_cards(self, cards):
+        pool = App.get_running_app().card_pool
+        for card in cards:
+            if card.parent is None or card.parent is self.ids.card_container.__self__:
+                pool.release(card)
+            else:
+                card._pool_on_drop = True
+
+    def apply_change(self, op, batch_ids_list):
+        # op comes from BatchManager.on_board_change; virtual columns patch their
+        # rows in place, everything else goes through the keyed reconcile
+        if self.is_virtual and op and op[0] != 'reset' and self._patch_rows(op, batch_ids_list):
+            return
+        self.update_cards(batch_ids_list)
+
+    def _patch_rows(self, op, batch_ids_list):
+        app = App.get_running_app()
+        bev_map = app.manager.beverage_map
+        rows = list(self.ids.rv_cards.data)
+        positions = [r['list_pos'] for r in rows]
+
+        def remove(index, count):
+            lo = bisect_left(positions, index)
+            hi = bisect_left(positions, index + count)
+            del rows[lo:hi]
+            del positions[lo:hi]
+            for r in rows[lo:]:
+                r['list_pos'] -= count
+            positions[lo:] = [p - count for p in positions[lo:]]
+
+        def insert(index, ids):
+            lo = bisect_left(positions, index)
+            for r in rows[lo:]:
+                r['list_pos'] += len(ids)
+            new_rows = []
+            for offset, b_id in enumerate(ids):
+                if b_id not in bev_map: continue
+                row = {'batch_id': b_id, 'stage_key': self.stage_key, 'list_pos': index + offset}
+                row.update(BatchCard.beverage_fields(bev_map[b_id]))
+                new_rows.append(row)
+            rows[lo:lo] = new_rows
+            positions[lo:] = [r['list_pos'] for r in rows[lo:]]
+
+        if op[0] == 'insert':
+            insert(op[1], op[2])
+        elif op[0] == 'remove':
+            remove(op[1], len(op[2]))
+        elif op[0] == 'move':
+            remove(op[1], 1)
+            insert(op[2], [op[3]])
+
+        # Dropping back under the threshold needs real cards again
+        if len(rows) <= VIRTUAL_COLUMN_THRESHOLD: return False
+        self._list_len = len(batch_ids_list)
+        self.ids.rv_cards.data = rows
+        return True
+
+    def _update_rows(self, new_keys, positions, bev_map):
+        # Virtual mode: only the rows on screen get BatchCard widgets
+        rows = []
+        for key, pos in zip(new_keys, positions):
+            row = {'batch_id': key[0], 'stage_key': self.stage_key, 'list_pos': pos}
+            row.update(BatchCard.beverage_fields(bev_map[key[0]]))
+            rows.append(row)
+        self.ids.rv_cards.data = rows
+
+    def _build_slots(self):
+        # One transform for the whole stack instead of one per card and per drop
+        offset = self.to_widget(0, 0)[1]
+        if self.is_virtual:
+            # Rows have a fixed height, so slots are arithmetic from the first row's top
+            layout = self.ids.rv_cards_layout
+            rv = self.ids.rv_cards
+            _, top = layout.to_window(layout.x, layout.top)
+            _, view_lo = rv.to_window(rv.x, rv.y)
+            self._slots = ('rows', top - layout.padding[1], layout.default_size[1],
+                           layout.spacing, view_lo, view_lo + rv.height, offset)
+            return self._slots
+        container = self.ids.card_container
+        scroll = self.ids.card_scroll
+        _, base = container.to_window(0, 0)
+        _, view_lo = scroll.to_window(scroll.x, scroll.y)
+        half_gap = container.spacing / 2
+        # children run bottom to top, so centers come out ascending
+        centers = []
+        positions = []
+        edges = []
+        for c in container.children:
+            if not edges: edges.append(base + c.y - half_gap)
+            centers.append(base + c.y + c.height / 2)
+            positions.append(c.list_pos)
+            edges.append(base + c.top + half_gap)
+        if not edges: edges.append(base + container.top - container.padding[1])
+        self._slots = ('cards', centers, positions, edges, view_lo, view_lo + scroll.height, offset)
+        return self._slots
+
+    def drop_slot(self, cy):
+        # (index in the manager list, marker y in column space or None) for a window y
+        if self.is_collapsed: return self._list_len, None
+        slots = self._slots or self._build_slots()
+        if slots[0] == 'rows':
+            _, first_top, row_h, spacing, view_lo, view_hi, offset = slots
+            rows = self.ids.rv_cards.data
+            step = row_h + spacing
+            idx = int(math.floor((first_top - row_h / 2 - cy) / step)) + 1
+            idx = max(0, min(idx, len(rows)))
+            pos = rows[idx]['list_pos'] if idx < len(rows) else self._list_len
+            y = first_top - idx * step + spacing / 2
+        else:
+            _, centers, positions, edges, view_lo, view_hi, offset = slots
+            # Cards whose center is below the pointer; the drop lands above the highest of them
+            n = bisect_left(centers, cy)
+            pos = positions[n - 1] if n else self._list_len
+            y = edges[n]
+        return pos, (y + offset if view_lo <= y <= view_hi else None)
+
+    def get_drop_index(self, cy, card):
+        # Map a window y-coordinate to an index in this column's manager list
+        pos = self.drop_slot(cy)[0]
+        # move_batch_drag removes the card before inserting it again
+        if card.stage_key == self.stage_key and 0 <= card.list_pos < pos:
+            pos -= 1
+        return pos
+
+    @staticmethod
+    def _longest_increasing(seq):
+        # Indices into seq forming the longest strictly increasing run (ignoring -1)
+        tails = []
+        tail_idx = []
+        prev = [-1] * len(seq)
+        for i, v in enumerate(seq):
+            if v < 0: continue
+            lo, hi = 0, len(tails)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if tails[mid] < v: lo = mid + 1
+                else: hi = mid
+            if lo == len(tails):
+                tails.append(v)
+                tail_idx.append(i)
+            else:
+                tails[lo] = v
+                tail_idx[lo] = i
+            prev[i] = tail_idx[lo - 1] if lo > 0 else -1
+        result = set()
+        i = tail_idx[-1] if tail_idx else -1
+        while i >= 0:
+            result.add(i)
+            i = prev[i]
+        return result
 
 class DashboardScreen(Screen):
     pass
@@ -543,12 +1048,21 @@ class DashboardScreen(Screen):
 class BatchFlowApp(App):
     manager = ObjectProperty(None)
     status_text = StringProperty("Initializing...")
+    # Mirrors of the manager's flags for the header buttons (kv is loaded before the manager exists)
+    can_undo = BooleanProperty(False)
+    can_redo = BooleanProperty(False)
     col_theme_blue = ListProperty([0.2, 0.8, 1, 1])
     columns = {} 
     trash_dock = ObjectProperty(None)
 
     def build(self):
         self.title = "BatchFlow"
+        # Text fields that currently have focus, reported by their kv on_focus
+        self.focused_inputs = WeakSet()
+        self.card_pool = CardPool()
+        # Selector rows, shared by every column and rebuilt only when the library/styles change
+        self.beverage_rows = SelectorRows(BeverageSelectRow.row_data)
+        self.style_rows = SelectorRows(StyleSelectRow.row_data)
         self.root_layout = FloatLayout()
         self.sm = ScreenManager()
         self.dashboard = DashboardScreen(name='dashboard')
@@ -556,20 +1070,37 @@ class BatchFlowApp(App):
         self.root_layout.add_widget(self.sm)
         self.trash_dock = TrashDock()
         self.root_layout.add_widget(self.trash_dock)
-        Clock.schedule_once(self.start_backend, 0.2)
+        if batchflow_trace.is_enabled():
+            Clock.schedule_interval(lambda dt: batchflow_trace.record_frame(dt), 0)
+            if batchflow_trace.STATE.overlay:
+                self.root_layout.add_widget(TraceOverlay())
+        STARTUP.mark('build')
+        # The backend starts once the empty shell is on screen
+        self.after_next_frame(self.start_backend)
         return self.root_layout
 
+    def after_next_frame(self, callback):
+        def on_flip(*args):
+            Window.unbind(on_flip=on_flip)
+            Clock.schedule_once(callback)
+        Window.bind(on_flip=on_flip)
+
     def start_backend(self, dt=None):
+        STARTUP.mark('shell_frame')
         try:
-            self.manager = BatchManager()
+            # Reuses the settings parsed at launch; if the file changed since, the watcher reloads it
+            # Only the board is loaded here; library sources follow once the columns are on screen
+            self.manager = BatchManager(settings=SETTINGS, profiler=STARTUP, defer_library=True)
             self.status_text = "System Ready"
             self.init_ui_columns()
-            self.manager.bind(rotation_list=self.refresh_ui)
-            self.manager.bind(deck_list=self.refresh_ui)
-            self.manager.bind(fermenting_list=self.refresh_ui)
-            self.manager.bind(finishing_list=self.refresh_ui)
+            self.manager.bind(on_board_change=self.on_board_change)
+            self.manager.bind(on_library_delta=self.refresh_ui)
+            self.manager.bind(can_undo=self.setter('can_undo'), can_redo=self.setter('can_redo'))
+            Window.bind(on_keyboard=self.on_keyboard)
             self.refresh_ui()
-            Clock.schedule_once(self.dismiss_splash, 0.5)
+            STARTUP.mark('columns')
+            self.manager.start_watching()
+            self.after_next_frame(self.startup_complete)
         except Exception as e:
             self.status_text = f"Error: {e}"
             print(f"Backend Error: {e}")
@@ -589,6 +1120,7 @@ class BatchFlowApp(App):
             container.add_widget(col)
             self.columns[key] = col
 
+    @traced
     def refresh_ui(self, *args):
         if not self.columns: return
         self.columns['rotation'].update_cards(self.manager.rotation_list)
@@ -596,35 +1128,102 @@ class BatchFlowApp(App):
         self.columns['fermenting'].update_cards(self.manager.fermenting_list)
         self.columns['finishing'].update_cards(self.manager.finishing_list)
 
+    def refresh_column(self, key):
+        col = self.columns.get(key)
+        if col: col.update_cards(getattr(self.manager, key + '_list'))
+
+    def on_board_change(self, manager, change):
+        # One call per manager transaction; only the columns it touched are updated
+        for key, op in change.get('ops', {}).items():
+            col = self.columns.get(key)
+            if col:
+                col.apply_change(op, getattr(manager, key + '_list'))
+        # Columns showing a beverage that was edited, deleted or restored
+        for key in change.get('refresh', ()):
+            col = self.columns.get(key)
+            if col:
+                col.update_cards(getattr(manager, key + '_list'))
+        if 'titles' in change or 'states' in change:
+            self.sync_column_headers()
+
+    def undo(self):
+        if self.manager: self.manager.undo()
+
+    def redo(self):
+        if self.manager: self.manager.redo()
+
+    def on_keyboard(self, window, key, scancode, codepoint, modifiers):
+        # Ctrl+Z undo, Ctrl+Y / Ctrl+Shift+Z redo
+        if 'ctrl' not in modifiers or codepoint not in ('z', 'y'): return False
+        # A focused text field keeps these keys for its own undo; TextInput doesn't consume them
+        if any(w.focus for w in self.focused_inputs): return False
+        if codepoint == 'y' or 'shift' in modifiers: self.redo()
+        else: self.undo()
+        return True
+
+    def input_focus(self, widget, focused):
+        # kv hands over a proxy; unwrap it so the set can hold a weak reference
+        widget = widget.__self__
+        if focused: self.focused_inputs.add(widget)
+        else: self.focused_inputs.discard(widget)
+
+    def sync_column_headers(self, *args):
+        for key, col in self.columns.items():
+            col.title = self.manager.column_titles.get(key, key.capitalize())
+            col.is_collapsed = self.manager.column_states.get(key, False)
+
     def open_source_popup(self):
-        self.manager.load_library() 
+        self.manager.load_library_async()
         popup = SourceSelectPopup()
         popup.open()
         
-    def dismiss_splash(self, dt):
+    def startup_complete(self, dt=None):
+        STARTUP.mark('first_frame')
+        self.dismiss_splash()
+        if not self.manager:
+            STARTUP.finish(os.path.join(DATA_DIR, "startup_log.jsonl"))
+            return
+        # Library sources and the style catalog load on a thread pool behind the column
+        # skeleton; cards fill in as each source is merged
+        self.manager.bind(loading_sources=self._library_loaded)
+        self.manager.load_library_async()
+        self.manager.preload_styles()
+        self._library_loaded(self.manager, self.manager.loading_sources)
+
+    def _library_loaded(self, manager, tags):
+        if tags: return
+        manager.unbind(loading_sources=self._library_loaded)
+        STARTUP.mark('library_load')
+        STARTUP.finish(os.path.join(DATA_DIR, "startup_log.jsonl"))
+
+    def dismiss_splash(self, dt=None):
         if hasattr(self, 'splash_queue'):
             self.splash_queue.put("STOP")
 
     def on_stop(self):
-        try:
-            save_w = max(Window.width, MIN_WIDTH)
-            save_h = max(Window.height, MIN_HEIGHT)
-            full_data = {}
-            if os.path.exists(SETTINGS_FILE):
-                with open(SETTINGS_FILE, 'r') as f:
-                    try: full_data = json.load(f)
-                    except: pass
-            full_data['window'] = {
-                'width': save_w,
-                'height': save_h,
-                'left': Window.left,
-                'top': Window.top
-            }
-            with open(SETTINGS_FILE, 'w') as f:
-                json.dump(full_data, f, indent=4)
-            print(f"[System] Saved window settings: {full_data['window']}")
-        except Exception as e:
-            print(f"[System] Failed to save window settings: {e}")
+        if self.manager:
+            self.manager.stop_watching()
+            self.manager.stop_loading()
+            self.manager.flush_workflow(timeout=SHUTDOWN_DRAIN_TIMEOUT)
+        if batchflow_trace.is_enabled():
+            print(f"[Trace] {self.card_pool.summary()}")
+            try:
+                batchflow_trace.export_jsonl(TRACE_FILE)
+            except OSError as e:
+                print(f"[Trace] Could not export trace: {e}")
+        window = {
+            'width': max(Window.width, MIN_WIDTH),
+            'height': max(Window.height, MIN_HEIGHT),
+            'left': Window.left,
+            'top': Window.top
+        }
+        if self.manager:
+            # Queued behind the board save on the I/O worker so neither overwrites the other
+            self.manager.io.submit(save_window_settings, window)
+            if not self.manager.io.drain(SHUTDOWN_DRAIN_TIMEOUT):
+                print("[System] Pending writes did not finish before exit")
+        else:
+            save_window_settings(window)
 
 # --- SPLASH SCREEN PROCESS ---
 def run_splash_screen(queue):
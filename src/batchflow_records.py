@@ -0,0 +1,104 @@
+import sys
+
+from batchflow_stream import read_value_at
+from batchflow_watcher import stat_key
+
+# The only fields cards, the editor and the selector read; everything else
+# (descriptions, srm, notes...) of the read-only sources stays on disk until
+# something asks for it
+CORE_FIELDS = ('id', 'name', 'bjcp', 'abv', 'ibu')
+
+_NOT_HEAVY = frozenset(CORE_FIELDS + ('_source',))
+_MISSING = object()
+
+def file_loader(path, key, offsets):
+    # Re-reads one record from a library file by seeking to the byte offset the parse
+    # found it at (offsets: id -> offset). Once the file has changed (a different stat
+    # key) the offsets no longer hold, so nothing is read and the fields stay empty
+    # until the changed file is parsed again.
+    def load(bev_id):
+        offset = offsets.get(bev_id)
+        if offset is None or stat_key(path) != key: return None
+        try:
+            ok, b = read_value_at(path, offset)
+        except (OSError, ValueError) as e:
+            print(f"[Logic] Could not reload {bev_id} from {path}: {e}")
+            return None
+        return b if ok and isinstance(b, dict) and b.get('id') == bev_id else None
+    return load
+
+class BeverageRecord:
+    # Compact, read-only stand-in for a parsed beverage dict. Reads like the dict
+    # it replaces (get, [], in, keys, items, dict(record)), with '_source' mapped
+    # to the source tag. Heavy fields are fetched through loader(id) on first use.
+
+    __slots__ = ('id', 'name', 'bjcp', 'abv', 'ibu', 'source', '_extra', '_loader')
+
+    def __init__(self, data, source, loader=None):
+        get = data.get
+        self.id = data['id']
+        self.name = get('name', _MISSING)
+        bjcp = get('bjcp', _MISSING)
+        self.bjcp = sys.intern(bjcp) if type(bjcp) is str else bjcp
+        abv = get('abv', _MISSING)
+        self.abv = sys.intern(abv) if type(abv) is str else abv
+        self.ibu = get('ibu', _MISSING)
+        self.source = sys.intern(source)
+        self._loader = loader
+        if data.keys() <= _NOT_HEAVY:
+            self._extra = {}
+        elif loader is None:
+            self._extra = {k: v for k, v in data.items() if k not in _NOT_HEAVY}
+        else:
+            # None = there are heavy fields, not loaded yet
+            self._extra = None
+
+    def _heavy(self):
+        if self._extra is None:
+            full = self._loader(self.id) or {}
+            self._extra = {k: v for k, v in full.items() if k not in _NOT_HEAVY}
+        return self._extra
+
+    def get(self, key, default=None):
+        if key in CORE_FIELDS:
+            value = getattr(self, key)
+            return default if value is _MISSING else value
+        if key == '_source': return self.source
+        return self._heavy().get(key, default)
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING: raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def keys(self):
+        keys = [k for k in CORE_FIELDS if getattr(self, k) is not _MISSING]
+        keys.extend(self._heavy())
+        keys.append('_source')
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        # Compares what the board shows, so a delta never forces a heavy-field load
+        if not isinstance(other, BeverageRecord): return NotImplemented
+        return (self.id == other.id and self.name == other.name and self.bjcp == other.bjcp and
+                self.abv == other.abv and self.ibu == other.ibu and self.source == other.source)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"BeverageRecord({self.id!r}, {self.get('name')!r}, {self.source!r})"
@@ -0,0 +1,136 @@
+import re
+from bisect import bisect_left, bisect_right
+from itertools import islice
+
+_NON_WORD = re.compile(r'[^\w]+')
+
+def normalize(text):
+    return _NON_WORD.sub(' ', str(text).lower()).strip()
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class SearchIndex:
+    # In-memory type-ahead index for the selector panels.
+    # Short terms (1-2 chars) match word prefixes through a sorted token table
+    # (a flattened prefix trie); longer terms match substrings through a trigram
+    # index. When nothing matches, keys sharing most of the query's trigrams are
+    # returned as fuzzy hits.
+
+    # Seeds larger than this are filtered in global order instead of sorted
+    SORT_LIMIT = 2000
+
+    def __init__(self):
+        self._texts = {}          # key -> " " + normalized text
+        self._sort = {}           # key -> sort key
+        self._token_keys = {}     # token -> set of keys
+        self._tokens = []         # sorted unique tokens, for prefix ranges
+        self._gram_keys = {}      # trigram -> set of keys
+        self._ordered = []        # keys in sort order
+        self._ordered_sort = []   # parallel sort keys, for bisect
+
+    def __len__(self):
+        return len(self._texts)
+
+    def __contains__(self, key):
+        return key in self._texts
+
+    def add(self, key, fields, sort_key):
+        text = normalize(' '.join(str(f) for f in fields if f))
+        if self._texts.get(key) == ' ' + text and self._sort.get(key) == sort_key: return
+        if key in self._texts:
+            self.remove(key)
+
+        self._texts[key] = ' ' + text
+        self._sort[key] = sort_key
+        for token in set(text.split()):
+            keys = self._token_keys.get(token)
+            if keys is None:
+                keys = self._token_keys[token] = set()
+                self._tokens.insert(bisect_left(self._tokens, token), token)
+            keys.add(key)
+        for gram in trigrams(text):
+            self._gram_keys.setdefault(gram, set()).add(key)
+        pos = bisect_right(self._ordered_sort, sort_key)
+        self._ordered.insert(pos, key)
+        self._ordered_sort.insert(pos, sort_key)
+
+    def remove(self, key):
+        text = self._texts.pop(key, None)
+        if text is None: return
+        text = text[1:]
+        sort_key = self._sort.pop(key)
+        for token in set(text.split()):
+            keys = self._token_keys[token]
+            keys.discard(key)
+            if not keys:
+                del self._token_keys[token]
+                del self._tokens[bisect_left(self._tokens, token)]
+        for gram in trigrams(text):
+            keys = self._gram_keys[gram]
+            keys.discard(key)
+            if not keys:
+                del self._gram_keys[gram]
+        pos = bisect_left(self._ordered_sort, sort_key)
+        while self._ordered[pos] != key:
+            pos += 1
+        del self._ordered[pos]
+        del self._ordered_sort[pos]
+
+    def _seed(self, term):
+        # Smallest known superset of the keys matching term, or None if too broad
+        if len(term) >= 3:
+            return min((self._gram_keys.get(g, ()) for g in trigrams(term)), key=len)
+        lo = bisect_left(self._tokens, term)
+        hi = bisect_left(self._tokens, term + '\uffff')
+        sets = [self._token_keys[t] for t in self._tokens[lo:hi]]
+        if sum(map(len, sets)) * 8 > len(self._texts): return None
+        return set().union(*sets)
+
+    def _fuzzy_keys(self, query):
+        grams = trigrams(query.replace(' ', ''))
+        if not grams: return set()
+        counts = {}
+        for g in grams:
+            for k in self._gram_keys.get(g, ()):
+                counts[k] = counts.get(k, 0) + 1
+        if not counts: return set()
+        best = max(counts.values())
+        if best * 3 < len(grams): return set()
+        return {k for k, c in counts.items() if c == best}
+
+    def search(self, query, limit=None):
+        # Keys matching every term, in sort order; None means "no filter"
+        query = normalize(query)
+        terms = query.split()
+        if not terms: return None
+
+        texts = self._texts
+        # Texts start with a space, so " " + term is a word-prefix test
+        needles = [t if len(t) >= 3 else ' ' + t for t in terms]
+        def matches(k):
+            text = texts[k]
+            for n in needles:
+                if n not in text: return False
+            return True
+
+        seeds = [c for c in map(self._seed, terms) if c is not None]
+        seed = None
+        for cand in sorted(seeds, key=len):
+            if seed is None:
+                seed = cand
+            elif len(seed) > self.SORT_LIMIT:
+                seed = seed & cand
+
+        if seed is not None and (limit is None or len(seed) <= self.SORT_LIMIT):
+            result = sorted(filter(matches, seed), key=self._sort.__getitem__)
+            if limit: result = result[:limit]
+        else:
+            # Walking the global order avoids sorting and stops once the limit is filled
+            ordered = self._ordered if seed is None else filter(seed.__contains__, self._ordered)
+            result = list(islice(filter(matches, ordered), limit))
+
+        if not result and len(query) >= 3:
+            result = sorted(self._fuzzy_keys(query), key=self._sort.__getitem__)
+            if limit: result = result[:limit]
+        return result
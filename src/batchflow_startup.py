@@ -0,0 +1,61 @@
+import json
+import os
+import time
+
+from batchflow_watcher import stat_key
+
+# Only the most recent runs are kept in the startup log
+LOG_KEEP = 50
+
+def read_settings(path):
+    # Parsed once at launch and handed to BatchManager, so the file is not read twice.
+    # The stat key is taken first so a write racing the read is picked up by the watcher.
+    key = stat_key(path)
+    if key is None:
+        return None, None
+    try:
+        with open(path, 'r') as f:
+            return json.load(f), key
+    except Exception as e:
+        print(f"[System] Could not parse settings: {e}")
+        return None, key
+
+class StartupProfiler:
+    # Records how long each startup phase took (imports, KV load, settings parse,
+    # library load, first frame) and appends the run to startup_log.jsonl.
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self._last = self.t0
+        self.phases = []
+        self.done = False
+
+    def mark(self, phase):
+        if self.done: return
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def total(self):
+        return self._last - self.t0
+
+    def finish(self, log_path):
+        if self.done: return
+        self.done = True
+        summary = ", ".join(f"{name} {secs * 1000:.0f}ms" for name, secs in self.phases)
+        print(f"[Startup] Interactive after {self.total():.2f}s ({summary})")
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'total': round(self.total(), 4),
+            'phases': {name: round(secs, 4) for name, secs in self.phases}
+        }
+        try:
+            lines = []
+            if os.path.exists(log_path):
+                with open(log_path, 'r') as f:
+                    lines = f.read().splitlines()[-(LOG_KEEP - 1):]
+            lines.append(json.dumps(entry))
+            with open(log_path, 'w') as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            print(f"[Startup] Could not write startup log: {e}")
@@ -0,0 +1,128 @@
+import json
+import os
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS beverages (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_beverages_name ON beverages(name);
+
+CREATE TABLE IF NOT EXISTS memberships (
+    column_key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    batch_id TEXT NOT NULL,
+    PRIMARY KEY (column_key, position)
+);
+CREATE INDEX IF NOT EXISTS idx_memberships_batch ON memberships(batch_id);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+class SQLiteStore:
+    # Optional storage for the local beverage library and the board columns.
+    # Used by BatchManager when "storage": "sqlite" is set in batchflow_settings.json.
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        try:
+            self.conn.close()
+        except sqlite3.Error: pass
+
+    # --- MIGRATION ---
+    def is_migrated(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'migrated'").fetchone()
+        return row is not None
+
+    def migrate_from_json(self, library_path, columns):
+        # One-shot import of the JSON library and board; later starts use the database only
+        if self.is_migrated(): return False
+        bevs = []
+        if os.path.exists(library_path):
+            try:
+                with open(library_path, 'r') as f:
+                    bevs = json.load(f).get('beverages', [])
+            except Exception as e:
+                print(f"[Store] Could not read {library_path} for migration: {e}")
+
+        with self.conn:
+            for b in bevs:
+                if isinstance(b, dict) and 'id' in b:
+                    self._upsert(b)
+            for key, ids in columns.items():
+                self._replace_column(key, ids)
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated', '1')")
+        print(f"[Store] Migrated {len(bevs)} beverages into {self.db_path}")
+        return True
+
+    # --- BEVERAGES ---
+    def all_beverages(self):
+        rows = self.conn.execute("SELECT data FROM beverages")
+        return [json.loads(r[0]) for r in rows]
+
+    def get_beverage(self, bev_id):
+        row = self.conn.execute("SELECT data FROM beverages WHERE id = ?", (bev_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def upsert_beverage(self, bev):
+        with self.conn:
+            self._upsert(bev)
+
+    def delete_beverage(self, bev_id):
+        with self.conn:
+            cur = self.conn.execute("DELETE FROM beverages WHERE id = ?", (bev_id,))
+        return cur.rowcount > 0
+
+    def _upsert(self, bev):
+        data = {k: v for k, v in bev.items() if k != '_source'}
+        self.conn.execute(
+            "INSERT OR REPLACE INTO beverages (id, name, data) VALUES (?, ?, ?)",
+            (str(bev['id']), str(bev.get('name', '')), json.dumps(data))
+        )
+
+    # --- BOARD ---
+    def load_columns(self):
+        columns = {}
+        rows = self.conn.execute(
+            "SELECT column_key, batch_id FROM memberships ORDER BY column_key, position"
+        )
+        for key, batch_id in rows:
+            columns.setdefault(key, []).append(batch_id)
+        return columns
+
+    def save_columns(self, columns):
+        # Only columns passed in are touched; all of them commit together
+        with self.conn:
+            for key, ids in columns.items():
+                self._replace_column(key, ids)
+
+    def find_batch(self, batch_id):
+        rows = self.conn.execute(
+            "SELECT column_key, position FROM memberships WHERE batch_id = ?", (batch_id,)
+        )
+        return [(key, pos) for key, pos in rows]
+
+    def _replace_column(self, key, ids):
+        self.conn.execute("DELETE FROM memberships WHERE column_key = ?", (key,))
+        self.conn.executemany(
+            "INSERT INTO memberships (column_key, position, batch_id) VALUES (?, ?, ?)",
+            [(key, i, b_id) for i, b_id in enumerate(ids)]
+        )
+
+    # --- EXPORT ---
+    def export_library(self, path, write_func):
+        # Keeps beverages_library.json current for the keglevel apps
+        bevs = sorted(self.all_beverages(), key=lambda b: b.get('name', ''))
+        write_func(path, {"beverages": bevs})
@@ -0,0 +1,179 @@
+import io
+import json
+import re
+
+CHUNK_SIZE = 65536
+
+_WS = re.compile(r'[ \t\n\r]*')
+# Strings (whole), a lone quote (string cut off by the buffer end) and structural characters
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|["\[\]{},]')
+# Whitespace, the ',' or ']' after an array element, whitespace
+_SEPARATOR = re.compile(r'[ \t\n\r]*([,\]])[ \t\n\r]*')
+# Characters a number can continue with
+_NUMBER_TAIL = re.compile(r'[0-9.eE+\-]*')
+_DECODER = json.JSONDecoder()
+
+class _Buffer:
+    # Sliding window over a text file: only the value being decoded plus one
+    # chunk is ever held in memory.
+
+    def __init__(self, f, chunk_size, track=False):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        # With track, (index in buf, byte offset in the file) of the last offset() asked for
+        self.track = track
+        self._mark = (0, 0)
+
+    def fill(self):
+        # Drop what has been consumed and append one more chunk; False at EOF.
+        # Reads grow with a value that spans several chunks, so re-decoding it stays linear.
+        if self.eof: return False
+        data = self.f.read(max(self.chunk_size, len(self.buf) - self.pos))
+        if not data:
+            self.eof = True
+            return False
+        if self.track: self._mark = (0, self.offset(self.pos))
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def offset(self, pos):
+        # Byte offset in the file of buf[pos]; only encodes the text since the last call,
+        # so positions must not move backwards
+        index, byte = self._mark
+        byte += len(self.buf[index:pos].encode('utf-8'))
+        self._mark = (pos, byte)
+        return byte
+
+    def peek(self):
+        while True:
+            self.pos = _WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf): return self.buf[self.pos]
+            if not self.fill(): return ''
+
+    def value_end(self):
+        # Index of the ',' or closing bracket that ends the value at pos, or None
+        # if the value runs past the buffer
+        open_brackets = []
+        for m in _TOKEN.finditer(self.buf, self.pos):
+            tok = m.group()
+            if tok == '"': return None
+            if tok == '{' or tok == '[':
+                open_brackets.append(tok)
+            elif tok == '}' or tok == ']':
+                if not open_brackets: return m.start()
+                # A mismatched bracket also closes whatever was left open inside it
+                opener = '{' if tok == '}' else '['
+                while open_brackets and open_brackets.pop() != opener: pass
+            elif not open_brackets:
+                return m.start()
+        return None
+
+    def decode(self):
+        # (True, value), or (False, None) once a malformed value has been skipped
+        while True:
+            if self.peek() == '': return False, None
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+            except ValueError:
+                end = self.value_end()
+                if end is not None:
+                    # A stray closing bracket still has to be stepped over
+                    self.pos = end if end > self.pos else self.pos + 1
+                    return False, None
+                if not self.fill():
+                    self.pos = len(self.buf)
+                    return False, None
+                continue
+            # A number cut by the buffer end can decode short ("428." reads as 428),
+            # so unless a delimiter follows it inside the buffer, read on and retry
+            if (isinstance(value, (int, float)) and not self.eof
+                    and _NUMBER_TAIL.match(self.buf, end).end() == len(self.buf) and self.fill()): continue
+            self.pos = end
+            return True, value
+
+def iter_beverages(path, chunk_size=CHUNK_SIZE, stats=None):
+    # Yields the records of a {"beverages": [...]} file one at a time.
+    # Malformed records are skipped (counted in stats['skipped']) instead of
+    # failing the whole file; a truncated file yields everything before the cut.
+    for _, value in _records(path, chunk_size, stats, False):
+        yield value
+
+def iter_beverage_offsets(path, chunk_size=CHUNK_SIZE, stats=None):
+    # Same as iter_beverages, as (byte offset of the record, record) for read_value_at
+    return _records(path, chunk_size, stats, True)
+
+def read_value_at(path, offset, chunk_size=4096):
+    # The JSON value starting at a byte offset; (False, None) if there isn't one
+    with open(path, 'rb') as raw:
+        raw.seek(offset)
+        with io.TextIOWrapper(raw, encoding='utf-8', newline='') as f:
+            return _Buffer(f, chunk_size).decode()
+
+def _records(path, chunk_size, stats, track):
+    # (offset or None, record) pairs; offsets are only worked out with track
+    if stats is None: stats = {}
+    stats.setdefault('records', 0)
+    stats.setdefault('skipped', 0)
+    # newline='' keeps "\r\n" as two characters, so offsets match the bytes on disk
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        buf = _Buffer(f, chunk_size, track)
+        if buf.peek() != '{':
+            raise ValueError("library is not a JSON object")
+        buf.pos += 1
+
+        # Find the top-level "beverages" key, skipping any other keys
+        while True:
+            c = buf.peek()
+            if c == '' or c == '}': return
+            if c == ',':
+                buf.pos += 1
+                continue
+            ok, key = buf.decode()
+            if not ok or not isinstance(key, str) or buf.peek() != ':':
+                raise ValueError("malformed library object")
+            buf.pos += 1
+            if key == 'beverages' and buf.peek() == '[':
+                buf.pos += 1
+                break
+            buf.decode()
+
+        raw_decode = _DECODER.raw_decode
+        separator = _SEPARATOR.match
+        while True:
+            c = buf.peek()
+            if c == '' or c == ']': return
+            if c == ',':
+                buf.pos += 1
+                continue
+
+            # Fast path: decode straight through the records already buffered;
+            # chunk edges and malformed records drop to buf.decode() below
+            text, pos = buf.buf, buf.pos
+            while True:
+                try:
+                    value, end = raw_decode(text, pos)
+                except ValueError:
+                    break
+                m = separator(text, end)
+                if m is None: break
+                start, pos = pos, m.end()
+                if isinstance(value, dict):
+                    stats['records'] += 1
+                    yield (buf.offset(start) if track else None), value
+                else:
+                    stats['skipped'] += 1
+                if m.group(1) == ']': return
+            buf.pos = pos
+
+            # peek() first: skipping whitespace may read on, and the offset is the record's
+            start = buf.offset(buf.pos) if track and buf.peek() else None
+            ok, value = buf.decode()
+            if ok and isinstance(value, dict):
+                stats['records'] += 1
+                yield start, value
+            else:
+                stats['skipped'] += 1
@@ -0,0 +1,165 @@
+import hashlib
+import heapq
+import json
+import os
+import re
+
+# Bump when the compiled row layout changes
+CACHE_VERSION = 1
+
+FALLBACK_STYLES = ["1A - American Light Lager", "1B - American Lager", "18B - American Pale Ale", "21A - American IPA"]
+
+def bjcp_sort_key(entry):
+    parts = re.split(r'[\s\-]+', entry, 1)
+    code = parts[0]
+    match = re.match(r"(\d+)([A-Za-z]*)", code)
+    if match:
+        return (int(match.group(1)), match.group(2))
+    return (9999, code)
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _extract_items(content):
+    if isinstance(content, list):
+        return content
+    if isinstance(content, dict):
+        for k in ['styles', 'beverages', 'entries', 'class']:
+            if k in content and isinstance(content[k], list):
+                return content[k]
+    return []
+
+def compile_styles(content):
+    # Reduce a guideline file to sorted [code, name, num, suffix] rows plus
+    # a separate {label: impression} map, which is only read when asked for.
+    rows = []
+    impressions = {}
+    for item in _extract_items(content):
+        if isinstance(item, dict):
+            s_id = ''
+            for key in ['id', 'number', 'code', 'style_id', 'bjcp', 'category', 'category_id']:
+                if key in item and item[key]:
+                    val = str(item[key]).strip()
+                    if len(val) < 6 and any(c.isdigit() for c in val):
+                        s_id = val
+                        break
+            s_name = item.get('name', '') or item.get('style', '') or item.get('title', '')
+            if not s_name: continue
+            label = f"{s_id} - {s_name}" if s_id else s_name
+            text = item.get('impression') or item.get('overall_impression')
+            if text:
+                impressions[label] = text
+        elif isinstance(item, str):
+            s_id, s_name, label = '', item, item
+        else:
+            continue
+        num, suffix = bjcp_sort_key(label)
+        rows.append([s_id, s_name, num, suffix])
+    rows.sort(key=lambda r: (r[2], r[3]))
+    return rows, impressions
+
+def row_label(row):
+    return f"{row[0]} - {row[1]}" if row[0] else row[1]
+
+class StyleCatalog:
+    # BJCP (and other guideline) styles, compiled once per source file and cached.
+    # The first base candidate that yields styles is used, then every *.json in
+    # extra_dir (mead, cider, full guideline sets...) is merged in.
+
+    def __init__(self, base_candidates, extra_dir, cache_dir):
+        self.base_candidates = base_candidates
+        self.extra_dir = extra_dir
+        self.cache_file = os.path.join(cache_dir, "bjcp_cache.json")
+        self.impressions_file = os.path.join(cache_dir, "bjcp_impressions.json")
+        self.stats = {'hits': 0, 'compiled': 0}
+        self._hashes = []
+        self._impressions = None
+
+    def _extra_sources(self):
+        if not os.path.isdir(self.extra_dir): return []
+        return [os.path.join(self.extra_dir, n) for n in sorted(os.listdir(self.extra_dir)) if n.endswith('.json')]
+
+    def _read_json(self, path, default):
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+
+    def load(self, write_func):
+        cache = self._read_json(self.cache_file, {})
+        if cache.get('version') != CACHE_VERSION:
+            cache = {'version': CACHE_VERSION, 'sources': {}}
+        cached_rows = cache.get('sources', {})
+        new_impressions = {}
+        used = {}
+
+        def rows_for(path):
+            try:
+                digest = file_hash(path)
+            except OSError:
+                return None, None
+            if digest in cached_rows:
+                self.stats['hits'] += 1
+                return digest, cached_rows[digest]
+            try:
+                with open(path, 'r') as f:
+                    rows, impressions = compile_styles(json.load(f))
+            except Exception as e:
+                print(f"[Styles] Error loading BJCP from {path}: {e}")
+                return None, None
+            self.stats['compiled'] += 1
+            new_impressions[digest] = impressions
+            return digest, rows
+
+        groups = []
+        for p in self.base_candidates:
+            if os.path.exists(p):
+                digest, rows = rows_for(p)
+                if rows:
+                    used[digest] = rows
+                    groups.append(rows)
+                    break
+        for p in self._extra_sources():
+            digest, rows = rows_for(p)
+            if rows:
+                used[digest] = rows
+                groups.append(rows)
+
+        if new_impressions or set(used) != set(cached_rows):
+            self._write_cache(used, new_impressions, write_func)
+        self._hashes = list(used)
+        self._impressions = None
+
+        # Each group is already sorted, so merging keeps the BJCP order without a re-sort
+        labels = []
+        seen = set()
+        for row in heapq.merge(*groups, key=lambda r: (r[2], r[3])):
+            label = row_label(row)
+            if label not in seen:
+                seen.add(label)
+                labels.append(label)
+        return labels
+
+    def _write_cache(self, used, new_impressions, write_func):
+        impressions = self._read_json(self.impressions_file, {})
+        impressions.update(new_impressions)
+        impressions = {h: v for h, v in impressions.items() if h in used}
+        try:
+            write_func(self.cache_file, {'version': CACHE_VERSION, 'sources': used}, indent=None)
+            write_func(self.impressions_file, impressions, indent=None)
+        except OSError as e:
+            print(f"[Styles] Could not write style cache: {e}")
+
+    def impression(self, label):
+        # Impressions stay on disk until the first time one is asked for
+        if self._impressions is None:
+            stored = self._read_json(self.impressions_file, {})
+            self._impressions = {}
+            for h in self._hashes:
+                self._impressions.update(stored.get(h, {}))
+        return self._impressions.get(label, '')
@@ -0,0 +1,89 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# BATCHFLOW_TRACE=1 (or "trace": true in batchflow_settings.json) turns tracing on;
+# BATCHFLOW_TRACE_OVERLAY=1 (or "trace_overlay": true) also shows the on-screen overlay.
+ENV_TRACE = 'BATCHFLOW_TRACE'
+ENV_OVERLAY = 'BATCHFLOW_TRACE_OVERLAY'
+DEFAULT_BUFFER = 4096
+FRAME_BUFFER = 240
+
+def _env_flag(name):
+    return os.environ.get(name, '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+class _State:
+    enabled = _env_flag(ENV_TRACE) or _env_flag(ENV_OVERLAY)
+    overlay = _env_flag(ENV_OVERLAY)
+    # (name, wall start, seconds, thread name)
+    spans = deque(maxlen=DEFAULT_BUFFER)
+    frames = deque(maxlen=FRAME_BUFFER)
+    # name -> [calls, total seconds, max seconds]
+    totals = {}
+    lock = threading.Lock()
+
+STATE = _State()
+
+def configure(settings=None):
+    # Either the env vars or the settings file can turn tracing on
+    settings = settings if isinstance(settings, dict) else {}
+    size = int(settings.get('trace_buffer', DEFAULT_BUFFER))
+    if STATE.spans.maxlen != size:
+        STATE.spans = deque(STATE.spans, maxlen=size)
+    STATE.overlay = _env_flag(ENV_OVERLAY) or bool(settings.get('trace_overlay', False))
+    STATE.enabled = STATE.overlay or _env_flag(ENV_TRACE) or bool(settings.get('trace', False))
+    if STATE.enabled:
+        print(f"[Trace] Tracing enabled ({STATE.spans.maxlen} spans)")
+    return STATE.enabled
+
+def is_enabled():
+    return STATE.enabled
+
+def record(name, start, seconds):
+    STATE.spans.append((name, start, seconds, threading.current_thread().name))
+    with STATE.lock:
+        entry = STATE.totals.get(name)
+        if entry is None:
+            STATE.totals[name] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]: entry[2] = seconds
+
+def record_frame(dt):
+    STATE.frames.append(dt)
+
+def traced(fn):
+    # Disabled tracing costs one attribute check per call
+    name = fn.__qualname__
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not STATE.enabled:
+            return fn(*args, **kwargs)
+        wall = time.time()
+        t = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            record(name, wall, time.perf_counter() - t)
+    return wrapper
+
+def slowest(count=5):
+    # Slowest spans still in the buffer
+    return sorted(list(STATE.spans), key=lambda s: s[2], reverse=True)[:count]
+
+def totals():
+    with STATE.lock:
+        return {name: list(v) for name, v in STATE.totals.items()}
+
+def export_jsonl(path):
+    spans = list(STATE.spans)
+    if not spans: return 0
+    with open(path, 'a') as f:
+        for name, start, seconds, thread in spans:
+            f.write(json.dumps({'name': name, 't': round(start, 6), 'ms': round(seconds * 1000, 3), 'thread': thread}) + "\n")
+    STATE.spans.clear()
+    return len(spans)
@@ -0,0 +1,331 @@
+# Offscreen UI benchmarks: boots BatchFlowApp without a display and scripts
+# column refreshes, card drags and selector openings against synthetic boards.
+#
+#   python batchflow_uibench.py                        # boards of 200 and 2000 batches
+#   python batchflow_uibench.py --boards 600 --out ui.json
+#   python batchflow_uibench.py --baseline ui.json     # compare, exit 1 on regression
+#
+# Each board runs in its own process (batchflow_main reads its settings at import).
+import argparse
+import gc
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from batchflow_bench import build_fixture, percentile, compare, DEFAULT_TOLERANCE
+
+DEFAULT_BOARDS = (200, 2000)
+DEFAULT_LIBRARY = 1000
+DEFAULT_REPEAT = 20
+# Frames pumped after each scripted action
+SETTLE_FRAMES = 3
+# Pointer moves per drag_hover run
+HOVER_STEPS = 30
+
+def summarize(samples):
+    if not samples: return {'p50_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+    return {
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+        'max_ms': round(max(samples) * 1000, 3)
+    }
+
+class KVTimer:
+    # Times Builder.apply, counting only the outermost call so nested rules are not counted twice
+    def __init__(self, builder):
+        self.builder = builder
+        self.original = builder.apply
+        self.seconds = 0.0
+        self.calls = 0
+        self._depth = 0
+        builder.apply = self._apply
+
+    def _apply(self, widget, *args, **kwargs):
+        self._depth += 1
+        t = time.perf_counter()
+        try:
+            return self.original(widget, *args, **kwargs)
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                self.seconds += time.perf_counter() - t
+                self.calls += 1
+
+    def take(self):
+        seconds, calls = self.seconds, self.calls
+        self.seconds, self.calls = 0.0, 0
+        return seconds, calls
+
+def run_child(args):
+    # Everything Kivy-related is imported here, after HOME points at the fixture
+    rng = random.Random(args.seed)
+    home = tempfile.mkdtemp(prefix=f"batchflow-uibench-{args.board}-")
+    os.environ['HOME'] = home
+    os.environ.setdefault('KIVY_NO_ARGS', '1')
+    os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+    os.environ.setdefault('SDL_VIDEODRIVER', 'offscreen')
+    try:
+        build_fixture(home, args.library, args.board, rng)
+        from kivy.config import Config
+        # No frame cap, so frame times are work, not vsync sleep
+        Config.set('graphics', 'maxfps', '0')
+        import batchflow_main
+        from batchflow_main import BatchFlowApp, BatchCard
+        from kivy.base import EventLoop
+        from kivy.clock import Clock
+        from kivy.core.window import Window
+        from kivy.lang import Builder
+        from kivy.app import App
+        from kivy.tests.common import UnitTestTouch
+
+        kv = KVTimer(Builder)
+        results = {}
+
+        # Time spent in collector pauses, so card churn shows up beyond raw action times
+        gc_time = {'start': 0.0, 'seconds': 0.0, 'collections': 0}
+        def on_gc(phase, info):
+            if phase == 'start':
+                gc_time['start'] = time.perf_counter()
+            else:
+                gc_time['seconds'] += time.perf_counter() - gc_time['start']
+                gc_time['collections'] += 1
+        gc.callbacks.append(on_gc)
+
+        def frame():
+            t = time.perf_counter()
+            EventLoop.idle()
+            return time.perf_counter() - t
+
+        def widget_count():
+            return sum(1 for w in Window.children for _ in w.walk())
+
+        def timed(fn):
+            t = time.perf_counter()
+            fn()
+            return time.perf_counter() - t
+
+        def scenario(name, step, repeat):
+            # step(i, frames) runs one scripted action and returns the time spent outside frames
+            actions, frames = [], []
+            kv.take()
+            pool = App.get_running_app().card_pool
+            pool_before = dict(pool.stats)
+            gc_time.update(seconds=0.0, collections=0)
+            for i in range(repeat):
+                spent = step(i, frames)
+                if spent is not None: actions.append(spent)
+                for _ in range(SETTLE_FRAMES):
+                    frames.append(frame())
+            kv_seconds, kv_calls = kv.take()
+            results[name] = {
+                'action': summarize(actions),
+                'frame': summarize(frames),
+                'kv_ms_per_op': round(kv_seconds * 1000 / repeat, 3),
+                'kv_rules_per_op': round(kv_calls / repeat, 1),
+                'gc_ms': round(gc_time['seconds'] * 1000, 3),
+                'gc_collections': gc_time['collections'],
+                'widgets': widget_count()
+            }
+            hits = pool.stats['hits'] - pool_before['hits']
+            misses = pool.stats['misses'] - pool_before['misses']
+            results[name]['card_pool'] = {
+                'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+                'hits': hits,
+                'misses': misses,
+                'peak': pool.stats['peak']
+            }
+
+        def run(app):
+            mgr = app.manager
+            cols = app.columns
+            for _ in range(SETTLE_FRAMES):
+                frame()
+            results['startup'] = {
+                'total_ms': round(batchflow_main.STARTUP.total() * 1000, 3),
+                'phases_ms': {n: round(s * 1000, 3) for n, s in batchflow_main.STARTUP.phases},
+                'widgets': widget_count(),
+                'virtual_columns': sorted(k for k, c in cols.items() if c.is_virtual)
+            }
+
+            # Board change -> on_board_change -> apply_change on the touched column
+            def refresh(i, frames):
+                lst = mgr.rotation_list
+                if not lst: return None
+                return timed(lambda: mgr.move_batch_drag(lst[-1], 'rotation', 'rotation', target_index=0))
+            scenario('refresh', refresh, args.repeat)
+
+            # Every column emptied and rebuilt from scratch
+            def rebuild(i, frames):
+                def go():
+                    for col in cols.values():
+                        col.update_cards([])
+                    app.refresh_ui()
+                return timed(go)
+            scenario('rebuild', rebuild, max(1, args.repeat // 4))
+
+            # Drag the top visible card to the next column and drop it mid-column
+            def top_card(col):
+                dock_top = app.trash_dock.top if app.trash_dock else 0
+                _, col_top = col.to_window(col.x, col.top)
+                best = None
+                for w in col.walk(restrict=True):
+                    if not isinstance(w, BatchCard) or w is col or w.opacity == 0 or not w.batch_id: continue
+                    x, y = w.to_window(w.center_x, w.center_y)
+                    if dock_top < y < col_top - 60 and (best is None or y > best[2]):
+                        best = (w, x, y)
+                return best
+
+            keys = ['rotation', 'deck', 'fermenting', 'finishing']
+            def drag(i, frames):
+                src = cols[keys[i % 2]]
+                dest = cols[keys[(i + 1) % 2]]
+                found = top_card(src)
+                if not found: return None
+                _, x, y = found
+                dx, _ = dest.to_window(dest.center_x, dest.center_y)
+                touch = UnitTestTouch(x, y)
+                spent = timed(touch.touch_down)
+                frames.append(frame())
+                spent += timed(lambda: touch.touch_move(x + 5, y - 5))
+                frames.append(frame())
+                spent += timed(lambda: touch.touch_move(dx, Window.height * 0.5))
+                frames.append(frame())
+                return spent + timed(touch.touch_up)
+            scenario('drag', drag, args.repeat)
+
+            # Pointer-rate moves while a card hovers down the next column (drop slot + marker)
+            hover_moves = []
+            def hover(i, frames):
+                src = cols[keys[i % 2]]
+                dest = cols[keys[(i + 1) % 2]]
+                found = top_card(src)
+                if not found: return None
+                _, x, y = found
+                dx, _ = dest.to_window(dest.center_x, dest.center_y)
+                touch = UnitTestTouch(x, y)
+                touch.touch_down()
+                touch.touch_move(x + 5, y - 5)
+                frames.append(frame())
+                spent = 0.0
+                for step in range(HOVER_STEPS):
+                    elapsed = timed(lambda: touch.touch_move(dx, Window.height * (0.9 - 0.8 * step / HOVER_STEPS)))
+                    hover_moves.append(elapsed)
+                    spent += elapsed
+                    frames.append(frame())
+                touch.touch_up()
+                return spent
+            scenario('drag_hover', hover, max(1, args.repeat // 4))
+            results['drag_hover']['move'] = summarize(hover_moves)
+
+            # Selector open + close, including the screen transitions
+            opened = []
+            def selector(i, frames):
+                col = cols['deck']
+                sm = col.ids.sm_col
+                spent = 0.0
+                for fn in (col.open_selector, col.show_cards):
+                    elapsed = timed(fn)
+                    if fn == col.open_selector: opened.append(elapsed)
+                    spent += elapsed
+                    for _ in range(240):
+                        frames.append(frame())
+                        if not sm.transition.is_active: break
+                return spent
+            scenario('selector', selector, max(1, args.repeat // 4))
+            results['selector']['open'] = summarize(opened)
+
+        class BenchApp(BatchFlowApp):
+            # Library sources load behind the skeleton; scenarios need the full board
+            def _library_loaded(self, manager, tags):
+                super()._library_loaded(manager, tags)
+                if not tags: Clock.schedule_once(self.run_bench)
+
+            def run_bench(self, dt):
+                try:
+                    run(self)
+                except Exception as e:
+                    results['error'] = repr(e)
+                finally:
+                    self.stop()
+
+        BenchApp().run()
+        with open(args.child, 'w') as f:
+            json.dump(results, f)
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offscreen BatchFlow UI benchmarks")
+    parser.add_argument('--boards', default=",".join(map(str, DEFAULT_BOARDS)), help="batch ids spread over the four columns")
+    parser.add_argument('--library', type=int, default=DEFAULT_LIBRARY, help="beverages per library source")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--out', help="write results as JSON (use as a later --baseline)")
+    parser.add_argument('--baseline', help="JSON results to compare against")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--board', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(args)
+        return 0
+
+    results = {}
+    for board in (int(b) for b in args.boards.split(',') if b):
+        print(f"[Bench] UI with {board} batches on the board, {args.library} beverages per source...")
+        fd, out_path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        try:
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--child', out_path,
+                            '--board', str(board), '--library', str(args.library),
+                            '--repeat', str(args.repeat), '--seed', str(args.seed)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+            with open(out_path, 'r') as f:
+                res = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"  run failed: {e}")
+            continue
+        finally:
+            os.remove(out_path)
+        results[str(board)] = res
+        if 'error' in res:
+            print(f"  error: {res['error']}")
+        st = res.get('startup', {})
+        print(f"  startup {st.get('total_ms', 0):.1f} ms, {st.get('widgets', 0)} widgets, virtual {st.get('virtual_columns')}")
+        for name, s in res.items():
+            if name == 'startup' or not isinstance(s, dict): continue
+            print(f"  {name:<10} action p50 {s['action']['p50_ms']:>8.2f} p99 {s['action']['p99_ms']:>8.2f} ms"
+                  f"  frame p50 {s['frame']['p50_ms']:>7.2f} p99 {s['frame']['p99_ms']:>7.2f} ms"
+                  f"  kv {s['kv_ms_per_op']:>7.2f} ms ({s['kv_rules_per_op']} rules)  widgets {s['widgets']}"
+                  f"  gc {s['gc_ms']:>7.2f} ms  card pool {s['card_pool']['hit_rate'] * 100:.0f}% hits")
+
+    report = {
+        'meta': {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'library': args.library, 'repeat': args.repeat},
+        'results': results
+    }
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f"[Bench] Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f).get('results', {})
+        # compare() looks at p50_ms, so flatten each scenario to its action and frame stats
+        def flat(res):
+            return {board: {f"{name}.{part}": s[part] for name, s in ops.items()
+                            if name != 'startup' and isinstance(s, dict) for part in ('action', 'frame')}
+                    for board, ops in res.items()}
+        print(f"[Bench] Compared with {args.baseline} (tolerance {args.tolerance:.2f}x):")
+        if compare(flat(results), flat(baseline), args.tolerance):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
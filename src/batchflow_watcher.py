@@ -0,0 +1,121 @@
+import os
+import select
+import struct
+import sys
+import threading
+
+# inotify flags (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+EVENT_HEADER = struct.Struct('iIII')
+
+def stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (path, st.st_mtime_ns, st.st_size, st.st_ino)
+
+class _Inotify:
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path):
+        return self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK) >= 0
+
+    def read_names(self):
+        names = set()
+        try:
+            buf = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(buf):
+            _, _, _, length = EVENT_HEADER.unpack_from(buf, offset)
+            offset += EVENT_HEADER.size
+            names.add(os.fsdecode(buf[offset:offset + length].rstrip(b'\0')))
+            offset += length
+        return names
+
+    def close(self):
+        try:
+            os.close(self.fd)
+        except OSError: pass
+
+class FileWatcher:
+    # Watches a set of files from a background thread and calls
+    # callback(tag, path, key) on that thread whenever one changes.
+    # Uses inotify on Linux; elsewhere (or if inotify fails) it polls stat().
+
+    def __init__(self, paths, callback, interval=2.0, settle=0.2):
+        self.paths = dict(paths)
+        self.callback = callback
+        self.interval = interval
+        self.settle = settle
+        # Files as they are now: only later changes are reported, so starting the
+        # watcher does not re-parse what the caller has loaded (or is still loading)
+        self._keys = {tag: stat_key(p) for tag, p in self.paths.items()}
+        self._stop = threading.Event()
+        self._thread = None
+        self._inotify = None
+
+    def start(self):
+        if self._thread is not None: return
+        if sys.platform.startswith('linux'):
+            try:
+                self._inotify = _Inotify()
+                # Files are replaced by rename, so watch the directories
+                for d in {os.path.dirname(p) for p in self.paths.values()}:
+                    if os.path.isdir(d):
+                        self._inotify.add_watch(d)
+            except (OSError, AttributeError) as e:
+                print(f"[Watcher] inotify unavailable, polling instead: {e}")
+                self._inotify = None
+        self._thread = threading.Thread(target=self._run, name="batchflow-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
+
+    def _run(self):
+        watched = {os.path.basename(p) for p in self.paths.values()}
+        while not self._stop.is_set():
+            if self._inotify:
+                ready, _, _ = select.select([self._inotify.fd], [], [], self.interval)
+                if ready:
+                    names = self._inotify.read_names()
+                    if not names & watched: continue
+                    # Let a burst of writes settle before reading the files
+                    if self._stop.wait(self.settle): break
+                    self._inotify.read_names()
+            elif self._stop.wait(self.interval):
+                break
+            # Also covers directories that did not exist when the watch started
+            self._check()
+
+    def _check(self):
+        for tag, path in self.paths.items():
+            key = stat_key(path)
+            if key != self._keys.get(tag):
+                self._keys[tag] = key
+                try:
+                    self.callback(tag, path, key)
+                except Exception as e:
+                    print(f"[Watcher] Error handling change to {path}: {e}")